@@ -1,74 +1,470 @@
-from flask import Flask, render_template, request, jsonify
-from utils.map_generators import generate_map, generate_filtered_map
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context, g
+from utils.map_generators import (
+    generate_map, generate_filtered_map, generate_incident_data, incident_data,
+    find_nearby_incidents, incident_records, stream_filtered_data, gzip_chunks,
+    generate_statistics, heat_points, find_hotspots, route_risk, generate_route_map,
+    incident_clusters, filter_rows
+)
+from utils.hotspots import hotspot_cache, DEFAULT_CELL_KM, DEFAULT_MIN_INCIDENTS, DEFAULT_MIN_Z
+from utils.route_risk import RISK_WEIGHT
+from utils.data_store import load_dataset
+from utils.render_cache import map_cache, normalize_filters
+from utils.render_pool import render, pool_stats
+from utils.map_artifacts import load_artifact, map_key
+from utils.http_cache import conditional, response_cache
+from utils.filter_index import filter_index
+from utils.gazetteer import gazetteer
+from utils.stats_engine import crime_statistics
+from utils.time_cube import time_cube, GRANULARITIES
+from utils.neighborhoods import load_neighborhoods, neighborhood_assignment
+from utils.ingest import append_incidents, MAX_BATCH_SIZE
+from utils.metrics import (
+    REQUEST_SECONDS, RESPONSE_BYTES, RENDER_CACHE, PROFILING, SamplingProfiler, render_metrics
+)
 import pandas as pd
 import json
+import re
+import threading
+import time
+
+DATA_FILE = 'data/crime_data.csv'
 
 app = Flask(__name__)
 
+# Part of every ETag, so pages cached by browsers are revalidated after a restart or deploy
+STARTED_AT = '%x' % time.time_ns()
+
+def _data_validators():
+    """ETag version and Last-Modified time of the data behind the read endpoints"""
+    dataset = load_dataset(DATA_FILE)
+    version = f'{dataset.version}.{load_neighborhoods().version}.{STARTED_AT}'
+    return version, dataset.signature[0] / 1e9
+
+cached = conditional(_data_validators)
+
+ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+# About a century; longer windows overflow the nanosecond timestamps dates are stored as
+MAX_DAYS = 36500
+DATE_FILTER_ERROR = f'date_from and date_to must be YYYY-MM-DD dates and days a whole number from 1 to {MAX_DAYS}'
+
+def _date_filters(values):
+    """The date_from, date_to and days filters from request args or a JSON body; raises ValueError if malformed"""
+    date_from = values.get('date_from') or None
+    date_to = values.get('date_to') or None
+    days = values.get('days') or None
+    for value in (date_from, date_to):
+        if value is not None:
+            if not isinstance(value, str) or not ISO_DATE.fullmatch(value):
+                raise ValueError(value)
+            try:
+                date = pd.Timestamp(value)
+            except (OverflowError, pd.errors.OutOfBoundsDatetime) as e:
+                raise ValueError(value) from e
+            # Dates are stored as nanoseconds, and date_to covers its whole day
+            if not pd.Timestamp.min <= date <= pd.Timestamp.max - pd.Timedelta(days=1):
+                raise ValueError(value)
+    if days is not None:
+        if isinstance(days, bool) or not isinstance(days, (int, str)):
+            raise ValueError(days)
+        days = int(days)
+        if not 1 <= days <= MAX_DAYS:
+            raise ValueError(days)
+    return date_from, date_to, days
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if PROFILING and request.args.get('profile'):
+        g.profiler = SamplingProfiler(threading.get_ident())
+        g.profiler.start()
+
+def _counted(body, labels):
+    """Pass a streamed body through, recording its size once it has been sent"""
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.observe(size, **labels)
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by route pattern rather than path so /api/location_details/<location> is one series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_start,
+                            method=request.method, route=route, status=response.status_code)
+    labels = {'method': request.method, 'route': route}
+    if response.is_streamed:
+        response.response = _counted(response.response, labels)
+    else:
+        RESPONSE_BYTES.observe(response.calculate_content_length() or 0, **labels)
+    
+    if g.profiler is not None:
+        g.profiler.stop()
+        response.headers['X-Profile'] = g.profiler.dump(f'{request.method} {request.path}')
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Request, stage and dataset load metrics in the Prometheus text format"""
+    for stat, value in map_cache.stats().items():
+        if isinstance(value, (int, float)):
+            RENDER_CACHE.set(value, stat=stat)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
+@cached
 def home():
-    crime_map = generate_map('data/crime_data.csv')
-    return render_template('index.html', map_html=crime_map)
+    data = load_dataset(DATA_FILE)
+    version = data.version
+    # The neighborhood layer also depends on the polygons file
+    key = ('map', load_neighborhoods().version)
+    # Pre-rendered by ``python -m utils.map_artifacts build`` when the data has not changed since
+    crime_map = map_cache.get_or_render(
+        version, key, lambda: load_artifact(data, map_key()) or render(generate_map, DATA_FILE)
+    )
+    try:
+        # The map already carries the incident layer, the page only needs the filter options and stats
+        bootstrap = _bootstrap(data, incidents=False)
+    except Exception as e:
+        print(f"Error building bootstrap data: {e}")
+        bootstrap = None  # the page fetches /api/bootstrap instead
+    return render_template('index.html', map_html=crime_map, bootstrap=bootstrap)
 
 @app.route('/filter', methods=['POST'])
 def filter_crimes():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'expected a JSON object'}), 400
     location_search = data.get('location', '')
     crime_type = data.get('crime_type', '')
     severity = data.get('severity', '')
+    neighborhood = data.get('neighborhood', '')
+    try:
+        date_from, date_to, days = _date_filters(data)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
     
-    filtered_map = generate_filtered_map('data/crime_data.csv', location_search, crime_type, severity)
+    dataset = load_dataset(DATA_FILE)
+    key = ('filtered',) + normalize_filters(location_search, crime_type, severity, neighborhood, date_from, date_to, days)
+    # Like the home map, filtered maps draw (and may filter by) the neighborhood polygons
+    filtered_map = map_cache.get_or_render(
+        dataset.version, key + (load_neighborhoods().version,),
+        lambda: load_artifact(dataset, key) or render(generate_filtered_map, DATA_FILE, location_search, crime_type,
+                                                      severity, neighborhood, date_from, date_to, days)
+    )
     return jsonify({'map_html': filtered_map})
 
+@app.route('/route', methods=['POST'])
+def route_map():
+    """Render the lowest-risk route to a destination, starting from the user's location when given"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'expected a JSON object'}), 400
+    destination = data.get('destination', '')
+    start = data.get('start', '')
+    lat, lng = data.get('lat'), data.get('lng')
+    try:
+        risk_weight = float(data.get('risk_weight', RISK_WEIGHT))
+        if lat is not None and lng is not None:
+            lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'risk_weight, lat and lng must be numbers'}), 400
+    if not 0 <= risk_weight <= 100:
+        return jsonify({'error': 'risk_weight must be between 0 and 100'}), 400
+    
+    route_html = render(generate_route_map, DATA_FILE, start, destination, lat, lng, risk_weight)
+    return jsonify({'map_html': route_html})
+
+@app.route('/api/incidents', methods=['POST'])
+def ingest_incidents():
+    """Append a batch of new incidents: a JSON list, or {"incidents": [...]}"""
+    data = request.get_json(silent=True)
+    records = data.get('incidents') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        return jsonify({'error': 'expected a list of incidents'}), 400
+    if len(records) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'at most {MAX_BATCH_SIZE} incidents per request'}), 413
+    
+    result = append_incidents(DATA_FILE, records)
+    return jsonify(result), (200 if result['accepted'] or not records else 400)
+
+@app.route('/api/incidents')
+@cached
+def get_incidents():
+    """Get the filtered incidents so the page can redraw the map's data layer"""
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    try:
+        data = generate_incident_data(
+            DATA_FILE,
+            request.args.get('location', ''),
+            request.args.get('crime_type', ''),
+            request.args.get('severity', ''),
+            output_format=request.args.get('format', 'columns'),
+            neighborhood_filter=request.args.get('neighborhood', ''),
+            date_from=date_from, date_to=date_to, days=days
+        )
+        return app.response_class(json.dumps(data, separators=(',', ':')), mimetype='application/json')
+    except Exception as e:
+        print(f"Error loading incidents: {e}")
+        return jsonify({'error': 'Failed to load incidents'}), 500
+
+@app.route('/api/export')
+@cached
+def export_crimes():
+    """Stream the filtered incidents as a CSV or NDJSON download, optionally gzipped"""
+    output_format = request.args.get('format', 'csv')
+    if output_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    
+    chunks = stream_filtered_data(
+        DATA_FILE,
+        request.args.get('location', ''),
+        request.args.get('crime_type', ''),
+        request.args.get('severity', ''),
+        output_format=output_format,
+        neighborhood_filter=request.args.get('neighborhood', ''),
+        date_from=date_from, date_to=date_to, days=days
+    )
+    filename = f"filtered_crimes.{output_format}"
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/api/clusters')
+@cached
+def get_clusters():
+    """Get incident clusters for the map viewport: bbox=west,south,east,north and zoom, optional date filters"""
+    try:
+        west, south, east, north = (float(v) for v in request.args.get('bbox', '').split(','))
+        zoom = request.args.get('zoom', 7, type=int)
+        limit = request.args.get('limit', 5000, type=int)
+    except ValueError:
+        return jsonify({'error': 'bbox must be west,south,east,north'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    
+    clusters, total = incident_clusters(DATA_FILE, west, south, east, north, zoom, limit, date_from, date_to, days)
+    return jsonify({
+        'zoom': zoom,
+        # Incidents in the viewport, and in the clusters returned when limit cut some off
+        'total': total,
+        'returned': sum(cluster['count'] for cluster in clusters),
+        'clusters': clusters
+    })
+
+@app.route('/api/heat')
+@cached
+def get_heat():
+    """Get severity-weighted heat map density cells for a viewport: bbox=west,south,east,north and zoom"""
+    try:
+        bbox = request.args.get('bbox')
+        bbox = tuple(float(v) for v in bbox.split(',')) if bbox else None
+        if bbox is not None and len(bbox) != 4:
+            raise ValueError
+        zoom = request.args.get('zoom', 7, type=int)
+    except ValueError:
+        return jsonify({'error': 'bbox must be west,south,east,north'}), 400
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    
+    flag = lambda name: request.args.get(name, '1').lower() not in ('0', 'false', 'no')
+    points = heat_points(
+        DATA_FILE, zoom, bbox,
+        request.args.get('location', ''),
+        request.args.get('crime_type', ''),
+        request.args.get('severity', ''),
+        request.args.get('neighborhood', ''),
+        weighted=flag('weighted'),
+        smooth=flag('smooth'),
+        date_from=date_from, date_to=date_to, days=days
+    )
+    data = {'zoom': zoom, 'count': len(points), 'points': points.round(5).tolist()}
+    return app.response_class(json.dumps(data, separators=(',', ':')), mimetype='application/json')
+
+@app.route('/api/hotspots')
+@cached
+def get_hotspots():
+    """Get ranked incident hotspots: optional crime_type, severity, date_from/date_to or days and clustering parameters"""
+    cell_km = request.args.get('cell_km', DEFAULT_CELL_KM, type=float)
+    min_incidents = request.args.get('min_incidents', DEFAULT_MIN_INCIDENTS, type=int)
+    min_z = request.args.get('min_z', DEFAULT_MIN_Z, type=float)
+    limit = request.args.get('limit', 50, type=int)
+    if not 0.05 <= cell_km <= 50 or min_incidents < 1 or limit < 1:
+        return jsonify({'error': 'cell_km must be between 0.05 and 50, min_incidents and limit at least 1'}), 400
+    
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    
+    hotspots = find_hotspots(
+        DATA_FILE,
+        request.args.get('crime_type', ''),
+        request.args.get('severity', ''),
+        date_from, date_to,
+        cell_km, min_incidents, min_z, min(limit, 500),
+        days=days
+    )
+    
+    return jsonify({
+        'cell_km': cell_km,
+        'min_incidents': min_incidents,
+        'min_z': min_z,
+        'count': len(hotspots),
+        'hotspots': hotspots
+    })
+
+@app.route('/api/route_risk')
+@cached
+def get_route_risk():
+    """Get the lowest-risk route between start and end ("lat,lng" or location names) and its risk score"""
+    risk_weight = request.args.get('risk_weight', RISK_WEIGHT, type=float)
+    if not 0 <= risk_weight <= 100:
+        return jsonify({'error': 'risk_weight must be between 0 and 100'}), 400
+    
+    try:
+        route = route_risk(DATA_FILE, request.args.get('start', ''), request.args.get('end', ''), risk_weight)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    return jsonify(route)
+
+@app.route('/api/cache_stats')
+def get_cache_stats():
+    """Get hit/miss/eviction counters of the rendered map, compressed response and hotspot caches and the render pool size"""
+    stats = map_cache.stats()
+    stats['render_pool'] = pool_stats()
+    stats['compressed_responses'] = response_cache.stats()
+    stats['hotspots'] = hotspot_cache.stats()
+    return jsonify(stats)
+
 @app.route('/api/locations')
+@cached
 def get_locations():
     try:
-        df = pd.read_csv('data/crime_data.csv')
-        locations = df['location_description'].unique().tolist()
-        # Remove any NaN values and sort
-        locations = [loc for loc in locations if pd.notna(loc)]
-        locations.sort()
+        # Distinct non-null values, kept up to date as incidents are ingested
+        locations = filter_index(load_dataset(DATA_FILE)).values('location_description')
         return jsonify(locations)
     except Exception as e:
         return jsonify([]), 500
 
+@app.route('/api/locations/suggest')
+@cached
+def suggest_locations():
+    """Get up to ``limit`` locations with a word starting with ``q``, for the search box typeahead"""
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    try:
+        return jsonify(gazetteer(load_dataset(DATA_FILE)).suggest(request.args.get('q', ''), limit))
+    except Exception as e:
+        print(f"Error suggesting locations: {e}")
+        return jsonify([]), 500
+
 @app.route('/api/crime_types')
+@cached
 def get_crime_types():
     try:
-        df = pd.read_csv('data/crime_data.csv')
-        crime_types = df['crime_type'].unique().tolist()
-        # Remove any NaN values and sort
-        crime_types = [ct for ct in crime_types if pd.notna(ct)]
-        crime_types.sort()
+        # Distinct non-null values, kept up to date as incidents are ingested
+        crime_types = filter_index(load_dataset(DATA_FILE)).values('crime_type')
         return jsonify(crime_types)
     except Exception as e:
         return jsonify([]), 500
 
+@app.route('/api/neighborhoods')
+@cached
+def get_neighborhoods():
+    """Get the neighborhood names for the filter dropdown"""
+    return jsonify(sorted(load_neighborhoods().names))
+
+@app.route('/api/neighborhoods/stats')
+@cached
+def get_neighborhood_stats():
+    """Get incident counts per neighborhood, by severity and crime type, optionally in a date range"""
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    try:
+        data = load_dataset(DATA_FILE)
+        rows = filter_rows(data, date_from=date_from, date_to=date_to, days=days)
+        return jsonify(neighborhood_assignment(data).stats(data.df, rows))
+    except Exception as e:
+        print(f"Error computing neighborhood statistics: {e}")
+        return jsonify({'total': 0, 'unassigned': 0, 'neighborhoods': []}), 500
+
+def _severity_stats(data):
+    # Precomputed when the dataset is loaded and updated on ingest
+    stats = crime_statistics(data)
+    
+    # Assuming you have a severity column
+    if stats.has_severity:
+        return stats.severity_summary()
+    
+    # If no severity column, distribute evenly for demo
+    total_crimes = stats.total
+    low_severity = int(total_crimes * 0.45)
+    medium_severity = int(total_crimes * 0.35)
+    high_severity = total_crimes - low_severity - medium_severity
+    
+    return {
+        'total': total_crimes,
+        'low': low_severity,
+        'medium': medium_severity,
+        'high': high_severity
+    }
+
+def _bootstrap(data, incidents=True):
+    """Everything the page needs on load, from one dataset snapshot: filter options, stats and the incident layer"""
+    payload = {
+        'version': data.version,
+        'crime_types': filter_index(data).values('crime_type'),
+        'neighborhoods': sorted(load_neighborhoods().names),
+        'stats': _severity_stats(data)
+    }
+    if incidents:
+        payload['incidents'] = incident_data(data, output_format='compact')
+    return payload
+
+@app.route('/api/bootstrap')
+@cached
+def get_bootstrap():
+    """Get the filter options, stats and compact incident layer in one response; incidents=0 leaves out the incidents"""
+    try:
+        data = load_dataset(DATA_FILE)
+        payload = _bootstrap(data, incidents=request.args.get('incidents', '1') not in ('0', 'false'))
+        return app.response_class(json.dumps(payload, separators=(',', ':')), mimetype='application/json')
+    except Exception as e:
+        print(f"Error building bootstrap data: {e}")
+        return jsonify({'error': 'Failed to load bootstrap data'}), 500
+
 @app.route('/api/stats')
+@cached
 def get_stats():
     try:
-        df = pd.read_csv('data/crime_data.csv')
-        
-        # Calculate stats
-        total_crimes = len(df)
-        
-        # Assuming you have a severity column
-        if 'severity' in df.columns:
-            low_severity = len(df[df['severity'].str.lower() == 'low'])
-            medium_severity = len(df[df['severity'].str.lower() == 'medium'])
-            high_severity = len(df[df['severity'].str.lower() == 'high'])
-        else:
-            # If no severity column, distribute evenly for demo
-            low_severity = int(total_crimes * 0.45)
-            medium_severity = int(total_crimes * 0.35)
-            high_severity = total_crimes - low_severity - medium_severity
-        
-        return jsonify({
-            'total': total_crimes,
-            'low': low_severity,
-            'medium': medium_severity,
-            'high': high_severity
-        })
+        return jsonify(_severity_stats(load_dataset(DATA_FILE)))
     except Exception as e:
         # Return default values if CSV reading fails
         return jsonify({
@@ -78,25 +474,53 @@ def get_stats():
             'high': 20
         })
 
+@app.route('/api/statistics')
+@cached
+def get_statistics():
+    """Get the full breakdown: counts by type, severity and location plus the latest incidents, optionally in a date range"""
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    return jsonify(generate_statistics(DATA_FILE, date_from, date_to, days))
+
+@app.route('/api/trends')
+@cached
+def get_trends():
+    """Get incident counts over time: granularity=day|week|month|year, optional dimension and date filters"""
+    granularity = request.args.get('granularity', 'month')
+    dimension = request.args.get('dimension') or None
+    cube = time_cube(load_dataset(DATA_FILE))
+    # from/to are still accepted as the original names of date_from/date_to
+    filters = {
+        'date_from': request.args.get('date_from') or request.args.get('from'),
+        'date_to': request.args.get('date_to') or request.args.get('to'),
+        'days': request.args.get('days')
+    }
+    try:
+        date_from, date_to, days = _date_filters(filters)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
+    
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    if dimension is not None and dimension not in cube.categories:
+        return jsonify({'error': f"dimension must be one of {', '.join(cube.categories)}"}), 400
+    
+    trends = cube.rollup(granularity, dimension, date_from, date_to, days)
+    
+    trends.update(granularity=granularity, dimension=dimension)
+    return jsonify(trends)
+
 @app.route('/api/location_details/<location>')
+@cached
 def get_location_details(location):
     """Get detailed information about a specific location for navigation"""
     try:
-        df = pd.read_csv('data/crime_data.csv')
-        location_data = df[df['location_description'] == location]
-        
-        if not location_data.empty:
-            # Get coordinates if available
-            lat = location_data.iloc[0].get('latitude', None)
-            lng = location_data.iloc[0].get('longitude', None)
-            
-            return jsonify({
-                'name': location,
-                'latitude': lat,
-                'longitude': lng,
-                'address': f"{location}, Andhra Pradesh, India",
-                'crime_count': len(location_data)
-            })
+        details = gazetteer(load_dataset(DATA_FILE)).details(location)
+        if details is not None:
+            details['address'] = f"{location}, Andhra Pradesh, India"
+            return jsonify(details)
         else:
             return jsonify({
                 'name': location,
@@ -109,30 +533,34 @@ def get_location_details(location):
         })
 
 @app.route('/api/nearby_locations')
+@cached
 def get_nearby_locations():
-    """Get locations near user's current position"""
+    """Get incidents near user's current position, nearest first"""
+    try:
+        date_from, date_to, days = _date_filters(request.args)
+    except ValueError:
+        return jsonify({'error': DATE_FILTER_ERROR}), 400
     try:
         lat = float(request.args.get('lat', 0))
         lng = float(request.args.get('lng', 0))
-        radius = float(request.args.get('radius', 10))  # km
+        k = request.args.get('k', None, type=int)  # optional: only the k nearest incidents
+        radius = request.args.get('radius', None if k else 10, type=float)  # km
+        limit = request.args.get('limit', 50, type=int)
         
-        df = pd.read_csv('data/crime_data.csv')
+        nearby = find_nearby_incidents(DATA_FILE, lat, lng, radius_km=radius, k=k,
+                                       date_from=date_from, date_to=date_to, days=days)
         
-        # If your CSV has latitude/longitude columns
-        if 'latitude' in df.columns and 'longitude' in df.columns:
-            # Calculate distance (simplified version)
-            df['distance'] = ((df['latitude'] - lat) ** 2 + (df['longitude'] - lng) ** 2) ** 0.5
-            nearby = df[df['distance'] <= radius * 0.01]  # Rough conversion
-            
-            locations = nearby['location_description'].unique().tolist()
-            return jsonify(locations[:20])  # Limit to 20 results
-        else:
-            # If no coordinates, return all locations
-            locations = df['location_description'].unique().tolist()
-            return jsonify(locations[:20])
+        # Distinct locations, ordered by their nearest incident
+        locations = nearby['location_description'].dropna().drop_duplicates().tolist()
+        
+        return jsonify({
+            'count': len(nearby),
+            'locations': locations[:20],  # Limit to 20 results
+            'incidents': incident_records(nearby.head(limit))
+        })
             
     except Exception as e:
-        return jsonify([])
+        return jsonify({'count': 0, 'locations': [], 'incidents': []})
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Compare filter latency of the inverted indexes against full-column pandas scans.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_filters --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import write_incidents_csv
+from utils.data_store import load_dataset
+from utils.filter_index import filter_index
+
+QUERIES = [
+    ('vijayawada', 'All', 'All'),
+    ('', 'Theft', 'All'),
+    ('', 'All', 'high'),
+    ('market', 'Fraud', 'Low'),
+    ('guntur bus', 'Assault', 'Medium'),
+]
+
+
+def scan_filter(df, location_filter, crime_type_filter, severity_filter):
+    """The previous per-call filtering: string scans over every row"""
+    if location_filter and location_filter.lower() != 'all':
+        df = df[df['location_description'].str.contains(location_filter, case=False, na=False, regex=False)]
+    if crime_type_filter and crime_type_filter != 'All':
+        df = df[df['crime_type'] == crime_type_filter]
+    if severity_filter and severity_filter != 'All':
+        df = df[df['severity'].str.lower() == severity_filter.lower()]
+    return df
+
+
+def _median_ms(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return round(float(np.median(timings)) * 1000, 3)
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            data = load_dataset(write_incidents_csv(os.path.join(tmp, f'incidents_{n}.csv'), n))
+            df = data.df
+
+            start = time.perf_counter()
+            index = filter_index(data)
+            build_ms = round((time.perf_counter() - start) * 1000, 3)
+
+            for query in QUERIES:
+                rows = index.filter_rows(*query)
+                expected = np.flatnonzero(df.index.isin(scan_filter(df, *query).index))
+                assert np.array_equal(rows, expected), query
+                results.append({
+                    'rows': n,
+                    'query': list(query),
+                    'matches': len(rows),
+                    'index_build_ms': build_ms,
+                    'scan_ms': _median_ms(lambda: scan_filter(df, *query), repeat),
+                    'index_ms': _median_ms(lambda: index.filter_rows(*query), repeat),
+                })
+                print(json.dumps(results[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Microbenchmarks of the map_generators functions on synthetic datasets.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_functions --sizes 10000 100000 --output functions.json
+
+Every function gets its own copy of the dataset, so ``cold_ms`` includes
+loading the CSV and building whatever indexes the function needs.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from benchmarks.harness import measure, write_report
+from benchmarks.synthetic import write_incidents_csv
+from utils import map_generators
+
+
+def _consume(chunks):
+    return ''.join(chunks)
+
+
+def cases(csv_file):
+    """(name, callable) pairs covering the public map_generators functions"""
+    return [
+        ('generate_map', lambda path: map_generators.generate_map(path)),
+        ('generate_filtered_map', lambda path: map_generators.generate_filtered_map(path, 'vijayawada', 'Theft', 'All')),
+        ('generate_incident_data', lambda path: map_generators.generate_incident_data(path, '', 'Theft', 'High')),
+        ('generate_incident_data_geojson',
+         lambda path: map_generators.generate_incident_data(path, '', 'Theft', 'High', output_format='geojson')),
+        ('get_unique_values', lambda path: map_generators.get_unique_values(path)),
+        ('generate_statistics', lambda path: map_generators.generate_statistics(path)),
+        ('generate_crime_trend_data', lambda path: map_generators.generate_crime_trend_data(path)),
+        ('search_crimes_near_location', lambda path: map_generators.search_crimes_near_location(path, 'Vijayawada Market')),
+        ('find_nearby_incidents', lambda path: map_generators.find_nearby_incidents(path, 16.5062, 80.6480, 5)),
+        ('heat_points', lambda path: map_generators.heat_points(path, 9, (80.2, 16.2, 81.0, 16.8))),
+        ('find_hotspots', lambda path: map_generators.find_hotspots(path, 'Theft')),
+        ('stream_filtered_data', lambda path: _consume(map_generators.stream_filtered_data(path, '', 'Fraud', 'All'))),
+        ('generate_route_map',
+         lambda path: map_generators.generate_route_map(path, 'Guntur Market', 'Vijayawada Market', 16.3, 80.4)),
+        ('route_risk', lambda path: map_generators.route_risk(path, 'Guntur Market', 'Vijayawada Market')),
+    ]
+
+
+def run(sizes, repeat, only=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            source = write_incidents_csv(os.path.join(tmp, f'incidents_{n}.csv'), n)
+            for name, func in cases(source):
+                if only and name not in only:
+                    continue
+                # A fresh path means a fresh dataset store, so nothing is prebuilt
+                path = shutil.copy(source, os.path.join(tmp, f'{name}_{n}.csv'))
+                result = {'function': name, 'rows': n}
+                result.update(measure(lambda: func(path), repeat))
+                results.append(result)
+                print(json.dumps(result))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--only', nargs='+', help='benchmark only these functions')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    write_report(run(args.sizes, args.repeat, args.only), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Compare map rendering time of the columnar render path against the old iterrows() path.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_render --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import folium
+import pandas as pd
+from folium import plugins
+
+from benchmarks.synthetic import write_incidents_csv
+from utils.data_store import load_dataset
+from utils.map_generators import generate_map
+
+
+def legacy_generate_map(df):
+    """The previous generate_map body: one folium Marker per row plus a second iterrows() pass"""
+    m = folium.Map(location=[15.9129, 79.7400], zoom_start=7, tiles='OpenStreetMap')
+    folium.TileLayer('CartoDB positron').add_to(m)
+    folium.TileLayer('CartoDB dark_matter').add_to(m)
+    marker_cluster = plugins.MarkerCluster().add_to(m)
+    colors = {'low': 'green', 'medium': 'orange', 'high': 'red'}
+
+    for index, row in df.iterrows():
+        lat = row.get('latitude', None)
+        lng = row.get('longitude', None)
+        if pd.isna(lat) or pd.isna(lng):
+            continue
+        location_name = row.get('location_description', 'Unknown Location')
+        crime_type = row.get('crime_type', 'Unknown Crime')
+        severity = row.get('severity', 'medium').lower()
+        date = row.get('date', 'Unknown Date')
+        popup_content = f"""
+            <div style="width: 250px;">
+                <h5>{location_name}</h5>
+                <p><strong>Crime Type:</strong> {crime_type}</p>
+                <p><strong>Severity:</strong> {severity.title()}</p>
+                <p><strong>Date:</strong> {date}</p>
+                <button onclick="parent.onMarkerClick('{location_name}', '{location_name}, Andhra Pradesh, India')"
+                        class="btn btn-sm btn-primary">
+                    📍 Select for Navigation
+                </button>
+            </div>
+            """
+        folium.Marker(
+            [lat, lng],
+            popup=folium.Popup(popup_content, max_width=300),
+            tooltip=f"{location_name} - {crime_type}",
+            icon=folium.Icon(color=colors.get(severity, 'blue'), icon='exclamation-triangle', prefix='fa')
+        ).add_to(marker_cluster)
+
+    heat_data = [[row['latitude'], row['longitude']] for idx, row in df.iterrows()
+                 if pd.notna(row['latitude']) and pd.notna(row['longitude'])]
+    if heat_data:
+        plugins.HeatMap(heat_data, name='Crime Heat Map').add_to(m)
+
+    folium.LayerControl().add_to(m)
+    plugins.Fullscreen().add_to(m)
+    plugins.MeasureControl().add_to(m)
+    return m._repr_html_()
+
+
+def _time(func, repeat):
+    """Return (best seconds, output) over ``repeat`` calls of ``func``"""
+    best, output = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def run(sizes, legacy_limit, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            csv_file = write_incidents_csv(os.path.join(tmp, f'incidents_{n}.csv'), n)
+            # Parse outside the timed region so only rendering is measured
+            df = load_dataset(csv_file).df
+
+            seconds, html = _time(lambda: generate_map(csv_file), repeat)
+            result = {'rows': n, 'columnar_s': round(seconds, 4), 'columnar_bytes': len(html)}
+
+            if n <= legacy_limit:
+                legacy_df = pd.read_csv(csv_file)
+                seconds, html = _time(lambda: legacy_generate_map(legacy_df), 1)
+                result.update(legacy_s=round(seconds, 4), legacy_bytes=len(html),
+                              speedup=round(seconds / result['columnar_s'], 1))
+            results.append(result)
+            print(json.dumps(result))
+            del df
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--legacy-limit', type=int, default=100000,
+                        help='skip the iterrows() implementation above this many rows')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.legacy_limit, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
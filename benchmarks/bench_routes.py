@@ -0,0 +1,102 @@
+"""Load-test every read-only app.py route in-process with the Flask test client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_routes --sizes 10000 100000 --concurrency 1 4 --output routes.json
+
+The app is pointed at a synthetic dataset; data/crime_data.csv is not
+touched. Ingestion (POST /api/incidents) is left out since it changes the
+data between calls. For a test against a real server process, see
+``benchmarks.load_test``.
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+
+import app as app_module
+from benchmarks.harness import measure, write_report
+from benchmarks.synthetic import write_incidents_csv
+from utils.render_cache import map_cache
+
+FILTERS = [
+    {'location': 'vijayawada', 'crime_type': 'All', 'severity': 'All'},
+    {'location': '', 'crime_type': 'Theft', 'severity': 'High'},
+    {'location': 'market', 'crime_type': 'Fraud', 'severity': 'Low'},
+]
+
+ROUTES = [
+    ('GET', '/'),
+    ('POST', '/filter'),
+    ('GET', '/api/incidents?crime_type=Theft&severity=High'),
+    ('GET', '/api/incidents?crime_type=Theft&severity=High&format=geojson'),
+    ('GET', '/api/export?crime_type=Fraud'),
+    ('GET', '/api/export?crime_type=Fraud&format=ndjson&gzip=1'),
+    ('GET', '/api/clusters?bbox=76.7,12.6,84.8,19.9&zoom=7'),
+    ('GET', '/api/heat?bbox=80.2,16.2,81.0,16.8&zoom=10'),
+    ('GET', '/api/hotspots?crime_type=Theft'),
+    ('GET', '/api/route_risk?start=Guntur Market&end=Vijayawada Market'),
+    ('GET', '/api/bootstrap'),
+    ('GET', '/api/locations'),
+    ('GET', '/api/locations/suggest?q=vij'),
+    ('GET', '/api/crime_types'),
+    ('GET', '/api/neighborhoods/stats'),
+    ('GET', '/api/stats'),
+    ('GET', '/api/statistics'),
+    ('GET', '/api/trends?granularity=week&dimension=crime_type'),
+    ('GET', '/api/location_details/Vijayawada Market'),
+    ('GET', '/api/nearby_locations?lat=16.5062&lng=80.6480&radius=5'),
+    ('GET', '/api/cache_stats'),
+]
+
+
+def _requester(client, method, path):
+    """Return a callable issuing the request and returning the response body"""
+    if method == 'POST':
+        # Cycle through filters so /filter measures renders as well as cache hits
+        filters = itertools.cycle(FILTERS)
+        return lambda: _checked(client.post(path, json=next(filters)))
+    return lambda: _checked(client.get(path))
+
+
+def _checked(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.request.path} returned {response.status_code}')
+    return response.get_data()
+
+
+def run(sizes, repeat, concurrencies):
+    results = []
+    original_data_file = app_module.DATA_FILE
+    client = app_module.app.test_client()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for n in sizes:
+                app_module.DATA_FILE = write_incidents_csv(os.path.join(tmp, f'incidents_{n}.csv'), n)
+                map_cache.clear()
+                for (method, path), concurrency in itertools.product(ROUTES, concurrencies):
+                    result = {'route': f'{method} {path}', 'rows': n}
+                    result.update(measure(_requester(client, method, path), repeat, concurrency))
+                    results.append(result)
+                    print(json.dumps(result))
+    finally:
+        app_module.DATA_FILE = original_data_file
+        map_cache.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4],
+                        help='numbers of concurrent test clients')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    write_report(run(args.sizes, args.repeat, args.concurrency), args.output)
+
+
+if __name__ == '__main__':
+    main()
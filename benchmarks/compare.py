@@ -0,0 +1,57 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare before.json after.json --threshold 0.2
+
+Results are matched on their function or route, row count and concurrency.
+A p95 latency, peak memory or payload size that grew by more than the
+threshold counts as a regression; the exit status is 1 if there is any.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ['p95_ms', 'p50_ms', 'peak_memory_bytes', 'payload_bytes']
+REGRESSION_METRICS = ['p95_ms', 'peak_memory_bytes', 'payload_bytes']
+
+
+def _key(result):
+    return (result.get('function') or result.get('route'), result.get('rows'), result.get('concurrency', 1))
+
+
+def _load(path):
+    with open(path) as f:
+        report = json.load(f)
+    results = report['results'] if isinstance(report, dict) else report
+    return {_key(result): result for result in results}
+
+
+def compare(before, after, threshold):
+    """Return one row per benchmark present in both files, with the relative change of each metric"""
+    rows = []
+    for key in sorted(set(before) & set(after), key=str):
+        changes = {}
+        for metric in METRICS:
+            old, new = before[key].get(metric), after[key].get(metric)
+            if old and new is not None:
+                changes[metric] = round((new - old) / old, 3)
+        regressed = [metric for metric in REGRESSION_METRICS if changes.get(metric, 0) > threshold]
+        rows.append({'benchmark': key[0], 'rows': key[1], 'concurrency': key[2],
+                     'change': changes, 'regressed': regressed})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative increase counted as a regression')
+    args = parser.parse_args()
+
+    rows = compare(_load(args.before), _load(args.after), args.threshold)
+    for row in rows:
+        print(json.dumps(row))
+    sys.exit(1 if any(row['regressed'] for row in rows) else 0)
+
+
+if __name__ == '__main__':
+    main()
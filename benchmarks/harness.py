@@ -0,0 +1,105 @@
+"""Timing, memory and payload measurements shared by the benchmark scripts"""
+import json
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+
+def payload_bytes(value):
+    """Size of a function result or response body as it would be sent"""
+    if value is None:
+        return 0
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    return len(json.dumps(value, default=str).encode('utf-8'))
+
+
+def _percentiles(timings):
+    timings = np.asarray(timings)
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 3),
+        'p95_ms': round(float(np.percentile(timings, 95)) * 1000, 3),
+        'mean_ms': round(float(timings.mean()) * 1000, 3)
+    }
+
+
+def measure(func, repeat=20, concurrency=1):
+    """Call ``func`` repeatedly and report latency percentiles, throughput, peak memory and payload size.
+
+    The first call is reported separately as ``cold_ms`` since it builds
+    whatever the dataset snapshot caches. Peak memory is traced over one
+    extra call, apart from the timed calls.
+    """
+    start = time.perf_counter()
+    result = func()
+    cold = time.perf_counter() - start
+
+    timings = []
+    lock = threading.Lock()
+
+    def worker(calls):
+        for _ in range(calls):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            with lock:
+                timings.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(repeat // concurrency + (i < repeat % concurrency),))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    report = {'cold_ms': round(cold * 1000, 3), 'calls': len(timings), 'concurrency': concurrency}
+    report.update(_percentiles(timings))
+    report['throughput_per_s'] = round(len(timings) / wall, 2) if wall > 0 else None
+    report['peak_memory_bytes'] = int(peak)
+    report['payload_bytes'] = payload_bytes(result)
+    return report
+
+
+def environment():
+    """Versions and revision recorded with every result file"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except Exception:
+        revision = None
+    return {
+        'revision': revision,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def write_report(results, output):
+    report = {'environment': environment(), 'results': results}
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
@@ -0,0 +1,121 @@
+"""Load-test a running server with a mix of map renders and cheap JSON requests.
+
+Start the server in the mode to measure, then point the load test at it:
+
+    python app.py                                                 # dev server, inline renders
+    CRIME_MAP_RENDER_WORKERS=2 gunicorn -c gunicorn.conf.py wsgi:app
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --duration 30
+
+Render requests use varying filters so most miss the map cache. The report
+shows throughput and latency percentiles for each kind of request; the
+figure to watch is the latency of the cheap endpoints while renders run.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+CHEAP_PATHS = ['/api/stats', '/api/crime_types', '/api/statistics']
+SEVERITIES = ['All', 'Low', 'Medium', 'High']
+
+
+def _get_json(url):
+    with urllib.request.urlopen(url, timeout=300) as response:
+        return json.loads(response.read())
+
+
+def _request(base_url, kind, rng, options):
+    if kind == 'cheap':
+        request = urllib.request.Request(base_url + rng.choice(CHEAP_PATHS))
+    else:
+        body = {
+            'location': rng.choice(options['words']),
+            'crime_type': rng.choice(options['crime_types']),
+            'severity': rng.choice(SEVERITIES)
+        }
+        request = urllib.request.Request(base_url + '/filter', data=json.dumps(body).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return len(response.read())
+
+
+def _worker(base_url, kind, deadline, seed, options, results, lock):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            size = _request(base_url, kind, rng, options)
+            error = False
+        except Exception:
+            size, error = 0, True
+        elapsed = time.perf_counter() - start
+        with lock:
+            results.append((kind, elapsed, size, error))
+
+
+def _summary(results, kind, duration):
+    latencies = np.array([elapsed for k, elapsed, _, error in results if k == kind and not error])
+    errors = sum(1 for k, _, _, error in results if k == kind and error)
+    if not len(latencies):
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / duration, 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 1),
+        'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 1),
+        'max_ms': round(float(latencies.max()) * 1000, 1)
+    }
+
+
+def run(base_url, duration, render_clients, cheap_clients, seed=0):
+    base_url = base_url.rstrip('/')
+    locations = _get_json(base_url + '/api/locations')
+    options = {
+        'words': sorted({word.lower() for location in locations for word in location.split() if len(word) > 3}) or [''],
+        'crime_types': ['All'] + _get_json(base_url + '/api/crime_types')
+    }
+
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=_worker, args=(base_url, kind, deadline, seed + i, options, results, lock))
+        for i, kind in enumerate(['render'] * render_clients + ['cheap'] * cheap_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'url': base_url,
+        'duration_s': duration,
+        'render_clients': render_clients,
+        'cheap_clients': cheap_clients,
+        'render': _summary(results, 'render', duration),
+        'cheap': _summary(results, 'cheap', duration)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--render-clients', type=int, default=4, help='clients requesting filtered map renders')
+    parser.add_argument('--cheap-clients', type=int, default=8, help='clients requesting JSON endpoints')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    report = run(args.url, args.duration, args.render_clients, args.cheap_clients)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
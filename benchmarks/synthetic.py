@@ -0,0 +1,98 @@
+"""Synthetic crime incidents for benchmarks, shaped like data/crime_data.csv
+
+Write a dataset of any size:
+
+    python -m benchmarks.synthetic 1000000 /tmp/incidents.csv --seed 1
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Rough bounding box of Andhra Pradesh
+LAT_RANGE = (12.6, 19.9)
+LNG_RANGE = (76.7, 84.8)
+
+CRIME_TYPES = ['Theft', 'Assault', 'Burglary', 'Fraud', 'Robbery', 'Vandalism',
+               'Cybercrime', 'Drug Trafficking', 'Domestic Violence', 'Homicide']
+CRIME_TYPE_WEIGHTS = [0.24, 0.14, 0.12, 0.11, 0.09, 0.08, 0.08, 0.06, 0.06, 0.02]
+
+SEVERITIES = ['Low', 'Medium', 'High']
+SEVERITY_WEIGHTS = [0.45, 0.35, 0.20]
+
+CITIES = {
+    'Vijayawada': (16.5062, 80.6480),
+    'Visakhapatnam': (17.6868, 83.2185),
+    'Guntur': (16.3067, 80.4365),
+    'Tirupati': (13.6288, 79.4192),
+    'Kurnool': (15.8281, 78.0373),
+    'Nellore': (14.4426, 79.9865),
+    'Kakinada': (16.9891, 82.2475),
+    'Rajahmundry': (17.0005, 81.8040),
+    'Anantapur': (14.6819, 77.6006),
+    'Kadapa': (14.4673, 78.8242),
+}
+PLACES = ['Railway Station', 'Bus Station', 'Market', 'Beach Road', 'MG Road',
+          'Temple Area', 'Old Town', 'Industrial Area', 'University', 'Main Road']
+
+
+def make_incidents(n, seed=0, start='2023-01-01', days=730, city_share=0.8, missing_share=0.0):
+    """Return ``n`` synthetic incidents clustered around Andhra Pradesh cities.
+
+    With ``missing_share``, that fraction of rows each loses its coordinates,
+    date or severity, like hand-entered records do.
+    """
+    rng = np.random.default_rng(seed)
+
+    city_names = list(CITIES)
+    city_idx = rng.integers(0, len(city_names), n)
+    place_idx = rng.integers(0, len(PLACES), n)
+    centers = np.array([CITIES[name] for name in city_names])
+
+    # Most incidents are scattered around a city centre, the rest anywhere in the state
+    in_city = rng.random(n) < city_share
+    lat = np.where(in_city, centers[city_idx, 0] + rng.normal(0, 0.05, n),
+                   rng.uniform(*LAT_RANGE, n))
+    lng = np.where(in_city, centers[city_idx, 1] + rng.normal(0, 0.05, n),
+                   rng.uniform(*LNG_RANGE, n))
+
+    locations = np.array([f'{city} {place}' for city in city_names for place in PLACES])
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit='D')
+
+    df = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'crime_type': rng.choice(CRIME_TYPES, n, p=CRIME_TYPE_WEIGHTS),
+        'date': dates.strftime('%Y-%m-%d'),
+        'severity': rng.choice(SEVERITIES, n, p=SEVERITY_WEIGHTS),
+        'latitude': lat.round(4),
+        'longitude': lng.round(4),
+        'location_description': locations[city_idx * len(PLACES) + place_idx],
+    })
+    if missing_share:
+        for columns in (['latitude', 'longitude'], ['date'], ['severity']):
+            df.loc[rng.random(n) < missing_share, columns] = np.nan
+    return df
+
+
+def write_incidents_csv(path, n, seed=0, **options):
+    """Write ``n`` synthetic incidents to ``path`` and return the path; ``options`` go to ``make_incidents``"""
+    make_incidents(n, seed=seed, **options).to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic crime incidents to a CSV file')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--days', type=int, default=730, help='number of days the dates are spread over')
+    parser.add_argument('--city-share', type=float, default=0.8, help='fraction of incidents around city centres')
+    parser.add_argument('--missing-share', type=float, default=0.0, help='fraction of rows missing each field')
+    args = parser.parse_args()
+
+    write_incidents_csv(args.path, args.rows, args.seed, days=args.days,
+                        city_share=args.city_share, missing_share=args.missing_share)
+
+
+if __name__ == '__main__':
+    main()
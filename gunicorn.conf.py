@@ -0,0 +1,30 @@
+"""Gunicorn settings for the crime map: gunicorn -c gunicorn.conf.py wsgi:app
+
+Concurrency is set through the environment:
+
+    CRIME_WEB_WORKERS         server processes (default: CPUs / (1 + render processes), at least 1)
+    CRIME_WEB_THREADS         request threads per server process (default 4)
+    CRIME_MAP_RENDER_WORKERS  map render processes per server process (default 1; 0 renders inline)
+
+Memory: server processes are forked from the preloaded app and share its
+copy of the dataset, but every render process is spawned and loads its own
+copy (memory-mapped from the binary snapshot when there is one, parsed from
+the CSV otherwise). Expect roughly one extra dataset in memory per render
+process, i.e. workers * render workers copies on top of the shared one.
+"""
+import multiprocessing
+import os
+
+# Render maps outside the request threads, so cheap JSON requests never queue behind a render.
+# Set before the app is preloaded, which is when utils.render_pool reads it.
+os.environ.setdefault('CRIME_MAP_RENDER_WORKERS', '1')
+render_workers = max(int(os.environ['CRIME_MAP_RENDER_WORKERS']), 0)
+
+bind = os.environ.get('CRIME_WEB_BIND', '0.0.0.0:8000')
+# Each server process brings its render processes, so size them together to one process per CPU
+workers = int(os.environ.get('CRIME_WEB_WORKERS', max(multiprocessing.cpu_count() // (1 + render_workers), 1)))
+threads = int(os.environ.get('CRIME_WEB_THREADS', 4))
+worker_class = 'gthread'
+# Load the app (and the dataset) before forking so workers share it
+preload_app = True
+timeout = int(float(os.environ.get('CRIME_MAP_RENDER_TIMEOUT', 120))) + 30
@@ -0,0 +1,34 @@
+import csv
+
+import pytest
+
+COLUMNS = ['id', 'crime_type', 'date', 'severity', 'latitude', 'longitude', 'location_description']
+
+ROWS = [
+    [1, 'Theft', '2025-05-01', 'Low', 16.5062, 80.6480, 'Vijayawada Railway Station'],
+    [2, 'Burglary', '2025-05-02', 'High', 13.6288, 79.4192, 'Tirupati Temple Area'],
+    [3, 'Assault', '2025-06-15', 'Medium', 17.6868, 83.2185, 'Visakhapatnam Beach Road'],
+    [4, 'Theft', '2025-07-20', 'High', 16.3067, 80.4365, 'Guntur Market'],
+]
+
+
+def write_crime_csv(path, rows=ROWS):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    return str(path)
+
+
+@pytest.fixture
+def crime_csv(tmp_path):
+    """A small crime CSV in a temporary directory"""
+    return write_crime_csv(tmp_path / 'crime_data.csv')
+
+
+@pytest.fixture
+def client(crime_csv, monkeypatch):
+    """A Flask test client serving ``crime_csv``"""
+    import app as app_module
+    monkeypatch.setattr(app_module, 'DATA_FILE', crime_csv)
+    return app_module.app.test_client()
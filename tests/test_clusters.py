@@ -0,0 +1,17 @@
+BBOX = '76,12,85,20'
+
+
+def test_total_counts_clusters_cut_off_by_limit(client):
+    full = client.get(f'/api/clusters?bbox={BBOX}&zoom=10').get_json()
+    assert full['total'] == full['returned'] == 4
+    assert len(full['clusters']) == 4
+
+    limited = client.get(f'/api/clusters?bbox={BBOX}&zoom=10&limit=1').get_json()
+    assert len(limited['clusters']) == 1
+    assert limited['total'] == 4
+    assert limited['returned'] == 1
+
+
+def test_total_respects_date_filters(client):
+    response = client.get(f'/api/clusters?bbox={BBOX}&zoom=10&limit=1&date_from=2025-05-01&date_to=2025-05-31')
+    assert response.get_json()['total'] == 2
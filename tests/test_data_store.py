@@ -0,0 +1,65 @@
+import hashlib
+import os
+
+from tests.conftest import write_crime_csv
+from utils.data_store import DatasetStore
+from utils.snapshot import build_snapshot
+
+
+def _rewrite(path, old, new):
+    """Edit the file in place, keeping its size and (by default) most of its bytes"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert len(old) == len(new) and old in data
+    stat = os.stat(path)
+    with open(path, 'wb') as f:
+        f.write(data.replace(old, new))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_same_size_edit_reloads(crime_csv):
+    store = DatasetStore(crime_csv)
+    before = store.get()
+    _rewrite(crime_csv, b'16.5062', b'17.9999')
+    after = store.get()
+    assert after.version != before.version
+    assert round(float(after.df['latitude'].iloc[0]), 4) == 17.9999
+
+
+def test_edit_plus_append_reloads(crime_csv):
+    store = DatasetStore(crime_csv)
+    store.get()
+    _rewrite(crime_csv, b'16.5062', b'17.9999')
+    with open(crime_csv, 'a') as f:
+        f.write('5,Fraud,2025-08-01,Low,16.0,80.0,Ongole Bus Stand\n')
+    data = store.get()
+    assert len(data.df) == 5
+    assert round(float(data.df['latitude'].iloc[0]), 4) == 17.9999
+
+
+class _Counter:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def extend(self, dataset, start):
+        return _Counter(self.rows + len(dataset.df) - start)
+
+
+def test_append_is_incremental(crime_csv):
+    store = DatasetStore(crime_csv)
+    before = store.get()
+    before.derived('counter', lambda data: _Counter(len(data.df)))
+    with open(crime_csv, 'a') as f:
+        f.write('5,Fraud,2025-08-01,Low,16.0,80.0,Ongole Bus Stand\n')
+    after = store.get()
+    # Extended from the previous snapshot rather than rebuilt
+    assert after.derived('counter', lambda data: None).rows == 5
+    with open(crime_csv, 'rb') as f:
+        assert after.digest == hashlib.sha256(f.read()).hexdigest()
+
+
+def test_stale_snapshot_is_not_used_after_in_place_edit(crime_csv):
+    build_snapshot(crime_csv)
+    _rewrite(crime_csv, b'16.5062', b'17.9999')
+    data = DatasetStore(crime_csv).get()
+    assert round(float(data.df['latitude'].iloc[0]), 4) == 17.9999
@@ -0,0 +1,22 @@
+import pytest
+
+
+@pytest.mark.parametrize('query', ['days=999999999', 'days=0', 'date_from=1000-01-01', 'date_to=9999-12-31',
+                                   'date_from=2025-02-30', 'date_from=20250601'])
+@pytest.mark.parametrize('path', ['/api/incidents', '/api/export', '/api/statistics', '/api/heat'])
+def test_out_of_range_date_filters_are_rejected(client, path, query):
+    response = client.get(f'{path}?{query}')
+    assert response.status_code == 400
+    assert 'date_from and date_to must be' in response.get_json()['error']
+
+
+def test_out_of_range_days_on_filter_is_rejected(client):
+    assert client.post('/filter', json={'days': 999999999}).status_code == 400
+    assert client.post('/filter', json={'date_from': 20240101}).status_code == 400
+
+
+def test_date_filters(client):
+    assert client.get('/api/incidents?date_from=2025-05-01&date_to=2025-05-31').get_json()['count'] == 2
+    # The last N days count back from the latest incident (2025-07-20)
+    assert client.get('/api/incidents?days=36').get_json()['count'] == 2
+    assert client.get('/api/incidents?days=36500').get_json()['count'] == 4
@@ -0,0 +1,64 @@
+import json
+
+from utils.data_store import load_dataset
+from utils.ingest import IncidentFollower
+
+
+def _incident(location):
+    return {'crime_type': 'Theft', 'severity': 'Low', 'latitude': 16.5, 'longitude': 80.6,
+            'location_description': location, 'date': '2025-07-01'}
+
+
+def _locations(csv_file):
+    return list(load_dataset(str(csv_file)).df['location_description'].astype(str))
+
+
+def test_follower_rejects_unreadable_lines_and_ingests_the_rest(crime_csv, tmp_path):
+    source = tmp_path / 'incoming.ndjson'
+    source.write_bytes(b'')
+    follower = IncidentFollower(str(source), str(crime_csv))
+    with open(source, 'ab') as f:
+        f.write(json.dumps(_incident('First')).encode() + b'\n')
+        f.write(b'\xff\xfe not utf-8\n')
+        f.write(b'{not json\n')
+        f.write(json.dumps({'crime_type': 'Theft'}).encode() + b'\n')
+        f.write(json.dumps(_incident('Second')).encode() + b'\n')
+        f.write(json.dumps(_incident('Partial'))[:20].encode())
+
+    result = follower.poll()
+    assert result['accepted'] == 2
+    assert [rejection['error'].split(':')[0] for rejection in result['rejected']] == [
+        'unreadable line', 'unreadable line', 'missing fields'
+    ]
+    assert _locations(crime_csv)[-2:] == ['First', 'Second']
+    # The partial last line is left for the next poll
+    assert follower.offset == source.stat().st_size - 20
+    assert follower.poll() is None
+
+
+def test_follower_retries_lines_whose_append_failed(crime_csv, tmp_path, monkeypatch):
+    source = tmp_path / 'incoming.ndjson'
+    source.write_text(json.dumps(_incident('Retried')) + '\n')
+    follower = IncidentFollower(str(source), str(crime_csv), from_start=True)
+
+    def fail(csv_file, records):
+        raise OSError('disk full')
+    monkeypatch.setattr('utils.ingest.append_incidents', fail)
+    try:
+        follower.poll()
+    except OSError:
+        pass
+    assert follower.offset == 0
+
+    monkeypatch.undo()
+    assert follower.poll()['accepted'] == 1
+    assert _locations(crime_csv).count('Retried') == 1
+
+
+def test_follower_reads_csv_sources(crime_csv, tmp_path):
+    source = tmp_path / 'incoming.csv'
+    incident = _incident('From CSV')
+    source.write_text(','.join(incident) + '\n' + ','.join(str(value) for value in incident.values()) + '\n')
+    follower = IncidentFollower(str(source), str(crime_csv), from_start=True)
+    assert follower.poll()['accepted'] == 1
+    assert _locations(crime_csv)[-1] == 'From CSV'
@@ -0,0 +1,26 @@
+import html
+
+from tests.conftest import ROWS, write_crime_csv
+from utils.map_layers import _compact_json
+
+HOSTILE = '</script><script>alert(document.domain)</script>'
+
+
+def test_compact_json_escapes_script_breakers():
+    encoded = _compact_json({'location': [HOSTILE, "St. Mary's & Co", ' ']})
+    for character in '<>&\' ':
+        assert character not in encoded
+
+
+def test_hostile_location_is_not_executable_in_rendered_maps(tmp_path, monkeypatch):
+    import app as app_module
+    rows = ROWS + [[5, 'Theft', '2025-08-01', 'High', 16.5, 80.6, HOSTILE]]
+    monkeypatch.setattr(app_module, 'DATA_FILE', write_crime_csv(tmp_path / 'hostile.csv', rows))
+    client = app_module.app.test_client()
+
+    home = client.get('/')
+    filtered = client.post('/filter', json={'crime_type': 'Theft'})
+    assert home.status_code == 200 and filtered.status_code == 200
+    # The map document is the decoded srcdoc of the iframe
+    for page in (home.get_data(as_text=True), filtered.get_json()['map_html']):
+        assert HOSTILE not in html.unescape(page)
@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/filter', '/route'])
+@pytest.mark.parametrize('body', ['[]', '"x"', '3', 'null', '{not json'])
+def test_non_object_bodies_are_rejected(client, path, body):
+    response = client.post(path, data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'expected a JSON object'}
+
+
+def test_filter_accepts_an_object(client):
+    response = client.post('/filter', json={'crime_type': 'Theft'})
+    assert response.status_code == 200
+    assert 'map_html' in response.get_json()
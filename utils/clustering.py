@@ -0,0 +1,163 @@
+import numpy as np
+
+from utils.geo import mercator_xy
+
+MAX_ZOOM = 18
+# Cluster cells are this many screen pixels wide at every zoom level
+CELL_PX = 64
+SEVERITY_LEVELS = ['low', 'medium', 'high']
+
+
+def severity_codes(df):
+    """Return 0/1/2 for low/medium/high severity and 3 for anything else"""
+    if 'severity' not in df.columns:
+        return np.full(len(df), len(SEVERITY_LEVELS), dtype='int64')
+    severity = df['severity'].str.lower()
+    codes = np.full(len(df), len(SEVERITY_LEVELS), dtype='int64')
+    for code, level in enumerate(SEVERITY_LEVELS):
+        codes[(severity == level).to_numpy()] = code
+    return codes
+
+
+def cells_per_axis(zoom):
+    return (2 ** zoom) * 256 // CELL_PX
+
+
+class ClusterLevel:
+    """Incidents aggregated into the grid cells of one zoom level, sorted by (y, x)"""
+
+    def __init__(self, zoom, cell_x, cell_y, count, lat_sum, lng_sum, severity):
+        self.zoom = zoom
+        self.dim = cells_per_axis(zoom)
+        self.cell_x = cell_x
+        self.cell_y = cell_y
+        self.keys = cell_y * self.dim + cell_x
+        self.count = count
+        self.lat_sum = lat_sum
+        self.lng_sum = lng_sum
+        self.severity = severity
+
+    @classmethod
+    def aggregate(cls, zoom, cell_x, cell_y, count, lat_sum, lng_sum, severity):
+        """Merge entries that fall in the same cell"""
+        dim = cells_per_axis(zoom)
+        keys, inverse = np.unique(cell_y * dim + cell_x, return_inverse=True)
+        merged_severity = np.column_stack([
+            np.bincount(inverse, weights=severity[:, column], minlength=len(keys))
+            for column in range(severity.shape[1])
+        ]).astype('int64')
+        return cls(
+            zoom, keys % dim, keys // dim,
+            np.bincount(inverse, weights=count, minlength=len(keys)).astype('int64'),
+            np.bincount(inverse, weights=lat_sum, minlength=len(keys)),
+            np.bincount(inverse, weights=lng_sum, minlength=len(keys)),
+            merged_severity
+        )
+
+    def coarser(self):
+        """Build the next zoom level out by merging 2x2 blocks of cells"""
+        return ClusterLevel.aggregate(self.zoom - 1, self.cell_x // 2, self.cell_y // 2,
+                                      self.count, self.lat_sum, self.lng_sum, self.severity)
+
+    def merge(self, other):
+        """Combine the cells of two levels with the same zoom"""
+        return ClusterLevel.aggregate(
+            self.zoom,
+            np.concatenate([self.cell_x, other.cell_x]), np.concatenate([self.cell_y, other.cell_y]),
+            np.concatenate([self.count, other.count]),
+            np.concatenate([self.lat_sum, other.lat_sum]), np.concatenate([self.lng_sum, other.lng_sum]),
+            np.concatenate([self.severity, other.severity])
+        )
+
+    def select(self, x0, x1, y0, y1):
+        """Return positions of cells inside the inclusive cell ranges"""
+        if x0 > x1 or y0 > y1:
+            return np.empty(0, dtype='int64')
+        if y1 - y0 + 1 > len(self.keys):
+            inside = (self.cell_x >= x0) & (self.cell_x <= x1) & (self.cell_y >= y0) & (self.cell_y <= y1)
+            return np.flatnonzero(inside)
+        rows = np.arange(y0, y1 + 1, dtype='int64') * self.dim
+        starts = np.searchsorted(self.keys, rows + x0, side='left')
+        ends = np.searchsorted(self.keys, rows + x1, side='right')
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+
+class ClusterHierarchy:
+    """Per-zoom cell aggregates of all incidents, built bottom-up once per dataset load.
+
+    Each level only stores occupied cells, and each level is derived from the
+    one below it, so building costs one sort of the points plus work
+    proportional to the number of occupied cells.
+    """
+
+    def __init__(self, lat, lng, severity):
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        lat, lng, severity = lat[valid], lng[valid], severity[valid]
+
+        x, y = mercator_xy(lat, lng)
+        dim = cells_per_axis(MAX_ZOOM)
+        severity_counts = np.zeros((len(lat), len(SEVERITY_LEVELS) + 1), dtype='int64')
+        severity_counts[np.arange(len(lat)), severity] = 1
+
+        level = ClusterLevel.aggregate(
+            MAX_ZOOM, (x * dim).astype('int64'), (y * dim).astype('int64'),
+            np.ones(len(lat)), lat, lng, severity_counts
+        )
+        self.levels = [None] * (MAX_ZOOM + 1)
+        self.levels[MAX_ZOOM] = level
+        for zoom in range(MAX_ZOOM - 1, -1, -1):
+            level = level.coarser()
+            self.levels[zoom] = level
+
+    @classmethod
+    def from_frame(cls, df):
+        if 'latitude' not in df.columns or 'longitude' not in df.columns:
+            return cls([], [], np.empty(0, dtype='int64'))
+        return cls(df['latitude'].to_numpy(), df['longitude'].to_numpy(), severity_codes(df))
+
+    def extend(self, dataset, start):
+        """Return a hierarchy that also counts the rows of ``dataset`` from position ``start`` on"""
+        added = ClusterHierarchy.from_frame(dataset.df.iloc[start:])
+        hierarchy = ClusterHierarchy.__new__(ClusterHierarchy)
+        hierarchy.levels = [level.merge(new) for level, new in zip(self.levels, added.levels)]
+        return hierarchy
+
+    def query(self, west, south, east, north, zoom, limit=None):
+        """Return the clusters visible in a bounding box at a zoom level and the incidents they hold in all.
+
+        With ``limit``, only the ``limit`` largest clusters are returned; the
+        total still counts every incident in the bounding box.
+        """
+        zoom = int(min(max(zoom, 0), MAX_ZOOM))
+        level = self.levels[zoom]
+
+        (x0, x1), (y1, y0) = mercator_xy([south, north], [west, east])
+        x0, x1, y0, y1 = (int(v * level.dim) for v in (x0, x1, y0, y1))
+        positions = level.select(x0, x1, y0, y1)
+        total = int(level.count[positions].sum())
+        if limit is not None and len(positions) > limit:
+            largest = np.argpartition(-level.count[positions], limit - 1)[:limit]
+            positions = np.sort(positions[largest])
+
+        count = level.count[positions]
+        lat = level.lat_sum[positions] / count
+        lng = level.lng_sum[positions] / count
+        severity = level.severity[positions]
+
+        clusters = [
+            {
+                'lat': round(float(lat[i]), 5),
+                'lng': round(float(lng[i]), 5),
+                'count': int(count[i]),
+                'severity': {name: int(severity[i, code]) for code, name in enumerate(SEVERITY_LEVELS)}
+            }
+            for i in range(len(positions))
+        ]
+        return clusters, total
+
+
+def cluster_hierarchy(dataset):
+    """Return the cluster hierarchy for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('cluster_hierarchy', lambda data: ClusterHierarchy.from_frame(data.df))
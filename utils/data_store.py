@@ -0,0 +1,241 @@
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pandas as pd
+
+from utils.metrics import DATASET_LOAD_SECONDS, DATASET_ROWS
+from utils.snapshot import read_snapshot, snapshot_dir
+
+# Column types used when parsing the crime CSV. Low-cardinality text columns are
+# stored as categoricals and coordinates as float32 to keep the frame compact.
+CSV_DTYPES = {
+    'crime_type': 'category',
+    'severity': 'category',
+    'location_description': 'category',
+    'latitude': 'float32',
+    'longitude': 'float32',
+}
+
+# Bytes before the end of the parsed data kept to tell a new line from a continued one
+TAIL_FINGERPRINT_BYTES = 64
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def _file_signature(path):
+    """Return the (mtime_ns, size) pair used to detect changes to a data file"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _read_bytes(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _prefix_hasher(path, end):
+    """SHA-256 hasher fed with the first ``end`` bytes of a file"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = end
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def _parse_csv(source, names=None):
+    """Parse crime CSV text with explicit column types and parsed dates"""
+    if names is None:
+        df = pd.read_csv(source, dtype=CSV_DTYPES)
+    else:
+        df = pd.read_csv(source, header=None, names=names, dtype=CSV_DTYPES)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    return df
+
+
+def read_crime_csv(path):
+    """Parse the crime CSV with explicit column types and parsed dates"""
+    return _parse_csv(path)
+
+
+def append_frames(df, new_rows):
+    """Concatenate two frames, extending categoricals so existing codes stay unchanged"""
+    new_rows = new_rows.reindex(columns=df.columns)
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            unseen = pd.Index(new_rows[column].dropna().unique()).astype(str).difference(dtype.categories)
+            categories = dtype.categories.append(unseen)
+            df = df.assign(**{column: df[column].cat.add_categories(unseen)})
+            new_rows = new_rows.assign(**{column: pd.Categorical(new_rows[column].astype(object), categories=categories)})
+        elif column in new_rows.columns and new_rows[column].dtype != dtype:
+            new_rows = new_rows.assign(**{column: new_rows[column].astype(dtype)})
+    return pd.concat([df, new_rows], ignore_index=True)
+
+
+class CrimeDataset:
+    """A read-only snapshot of the crime data as it was loaded from disk.
+
+    Callers must treat ``df`` as immutable: it is shared by every request
+    in the process. Structures computed from the data (indexes, aggregates)
+    should be attached through ``derived`` so they live exactly as long as
+    the snapshot they were built from.
+    """
+
+    def __init__(self, df, path, signature, offset=None, tail=b'', digest=None):
+        self.df = df
+        self.path = path
+        self.signature = signature
+        self.version = '%x-%x' % signature
+        self.loaded_at = time.time()
+        # Number of bytes of the file parsed into ``df``, the bytes just before that point and their SHA-256
+        self.offset = signature[1] if offset is None else offset
+        self.tail = tail
+        self.digest = digest
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def derived(self, name, builder):
+        """Return ``builder(self)``, computing it at most once per snapshot"""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = builder(self)
+            return self._derived[name]
+
+    def extend(self, new_rows, signature, offset, tail, digest=None):
+        """Return a new snapshot with ``new_rows`` appended.
+
+        Derived structures that define ``extend(dataset, start)`` are updated
+        with just the appended rows (``dataset.df.iloc[start:]``); any other
+        derived structure is dropped and rebuilt on first use.
+        """
+        snapshot = CrimeDataset(append_frames(self.df, new_rows), self.path, signature, offset, tail, digest)
+        with self._lock:
+            derived = dict(self._derived)
+        for name, value in derived.items():
+            if hasattr(value, 'extend'):
+                snapshot._derived[name] = value.extend(snapshot, len(self.df))
+        return snapshot
+
+
+class DatasetStore:
+    """Process-wide holder for one data file, reloaded when the file changes.
+
+    When the file has only grown (new rows appended after the bytes already
+    parsed), just the new complete lines are parsed and appended. A binary
+    snapshot of the file (see ``utils.snapshot``) is memory-mapped instead
+    of parsing the CSV when it is still valid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current snapshot, re-reading the file if its mtime/size changed"""
+        signature = _file_signature(self.path)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._lock:
+            signature = _file_signature(self.path)
+            if self._snapshot is None or self._snapshot.signature != signature:
+                start = time.perf_counter()
+                snapshot = self._appended(self._snapshot, signature)
+                kind = 'append'
+                if snapshot is None:
+                    snapshot = self._load(signature)
+                    kind = 'load'
+                DATASET_LOAD_SECONDS.observe(time.perf_counter() - start, kind=kind)
+                DATASET_ROWS.set(len(snapshot.df), path=self.path)
+                self._snapshot = snapshot
+            return self._snapshot
+
+    def _load(self, signature):
+        snapshot = self._load_snapshot(signature)
+        if snapshot is not None:
+            return snapshot
+        data = _read_bytes(self.path, 0, signature[1])
+        df = _parse_csv(io.BytesIO(data))
+        return CrimeDataset(df, self.path, signature, len(data), data[-TAIL_FINGERPRINT_BYTES:],
+                            hashlib.sha256(data).hexdigest())
+
+    def _load_snapshot(self, signature):
+        """Return the dataset from the binary snapshot plus rows appended since, or None if it is stale"""
+        directory = snapshot_dir(self.path)
+        if not os.path.isdir(directory):
+            return None
+        try:
+            df, (source_signature, offset, tail, digest) = read_snapshot(directory)
+        except Exception as e:
+            print(f"Error reading snapshot {directory}: {e}")
+            return None
+
+        snapshot = CrimeDataset(df, self.path, source_signature, offset, tail, digest)
+        if source_signature == signature:
+            return snapshot
+        return self._appended(snapshot, signature)
+
+    def _appended(self, snapshot, signature):
+        """Return ``snapshot`` extended with rows appended to the file, or None if it was rewritten.
+
+        Only a file that grew and whose already parsed bytes still hash the
+        same counts as appended to; an edit in place, even one that keeps the
+        size, means a full reload.
+        """
+        if snapshot is None or snapshot.digest is None or signature[1] <= snapshot.offset:
+            return None
+        hasher = _prefix_hasher(self.path, snapshot.offset)
+        if hasher.hexdigest() != snapshot.digest:
+            return None
+
+        data = _read_bytes(self.path, snapshot.offset, signature[1])
+        if snapshot.tail and not snapshot.tail.endswith(b'\n') and not data.startswith(b'\n'):
+            # The last parsed line was continued rather than new lines added
+            return None
+
+        # Only parse complete lines; a partially written last line is read next time
+        complete = data[:data.rfind(b'\n') + 1]
+        offset = snapshot.offset + len(complete)
+        tail = (snapshot.tail + complete)[-TAIL_FINGERPRINT_BYTES:]
+        hasher.update(complete)
+        if not complete.strip():
+            unchanged = CrimeDataset(snapshot.df, self.path, signature, offset, tail, hasher.hexdigest())
+            unchanged._derived = dict(snapshot._derived)
+            return unchanged
+
+        new_rows = _parse_csv(io.BytesIO(complete), names=list(snapshot.df.columns))
+        return snapshot.extend(new_rows, signature, offset, tail, hasher.hexdigest())
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(csv_file):
+    """Return the shared store for ``csv_file``, creating it on first use"""
+    path = os.path.abspath(csv_file)
+    store = _stores.get(path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(path, DatasetStore(path))
+    return store
+
+
+def load_dataset(csv_file):
+    """Return the current ``CrimeDataset`` snapshot for ``csv_file``"""
+    return get_store(csv_file).get()
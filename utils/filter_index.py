@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+
+EMPTY_ROWS = np.empty(0, dtype='int64')
+DAY_NS = 24 * 60 * 60 * 10 ** 9
+
+
+def intersect_sorted(small, large):
+    """Intersect two sorted arrays of unique row ids in O(len(small) * log(len(large)))"""
+    if not len(small) or not len(large):
+        return EMPTY_ROWS
+    positions = np.searchsorted(large, small).clip(max=len(large) - 1)
+    return small[large[positions] == small]
+
+
+class Postings:
+    """Row ids grouped by category code, stored as one sorted array plus offsets"""
+
+    def __init__(self, codes, n_categories):
+        # Missing values have code -1; shift so they get their own (ignored) group 0
+        shifted = np.asarray(codes, dtype='int64') + 1
+        self.rows = np.argsort(shifted, kind='stable')
+        counts = np.bincount(shifted, minlength=n_categories + 1)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def extend(self, new_codes, start, n_categories):
+        """Return postings that also hold rows ``start, start + 1, ...`` with ``new_codes``"""
+        shifted = np.asarray(new_codes, dtype='int64') + 1
+        new_rows = np.argsort(shifted, kind='stable') + start
+        new_counts = np.bincount(shifted, minlength=n_categories + 1)
+        old_counts = np.zeros(n_categories + 1, dtype='int64')
+        old_counts[:len(self.offsets) - 1] = np.diff(self.offsets)
+        old_offsets = np.concatenate([[0], np.cumsum(old_counts)])
+        new_offsets = np.concatenate([[0], np.cumsum(new_counts)])
+
+        # Each group keeps its existing rows and gets the new ones (all larger ids) after them
+        merged = Postings.__new__(Postings)
+        merged.offsets = old_offsets + new_offsets
+        merged.rows = np.empty(merged.offsets[-1], dtype='int64')
+        groups = np.arange(n_categories + 1)
+        old_group = np.repeat(groups, old_counts)
+        new_group = np.repeat(groups, new_counts)
+        merged.rows[np.arange(len(self.rows)) - old_offsets[old_group] + merged.offsets[old_group]] = self.rows
+        merged.rows[np.arange(len(new_rows)) - new_offsets[new_group] + merged.offsets[new_group]
+                    + old_counts[new_group]] = new_rows
+        return merged
+
+    def count(self, code):
+        return int(self.offsets[code + 2] - self.offsets[code + 1])
+
+    def rows_for(self, codes):
+        """Return the sorted row ids having any of the given category codes"""
+        parts = [self.rows[self.offsets[code + 1]:self.offsets[code + 2]] for code in codes]
+        if not parts:
+            return EMPTY_ROWS
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+
+class TrigramIndex:
+    """Case-insensitive substring search over a small vocabulary of strings"""
+
+    def __init__(self, values):
+        self.values = []
+        self.grams = {}
+        self._add(values)
+
+    def _add(self, values):
+        grams = {}
+        for value in values:
+            code = len(self.values)
+            value = str(value).lower()
+            self.values.append(value)
+            for gram in {value[i:i + 3] for i in range(len(value) - 2)}:
+                grams.setdefault(gram, []).append(code)
+        for gram, codes in grams.items():
+            codes = np.array(codes, dtype='int64')
+            self.grams[gram] = codes if gram not in self.grams else np.concatenate([self.grams[gram], codes])
+
+    def extend(self, values):
+        """Return an index that also covers ``values`` (codes continue after the existing ones)"""
+        index = TrigramIndex([])
+        index.values = list(self.values)
+        index.grams = dict(self.grams)
+        index._add(values)
+        return index
+
+    def search(self, query):
+        """Return the codes of values containing ``query`` (case-insensitive)"""
+        query = query.lower()
+        if len(query) < 3:
+            return [code for code, value in enumerate(self.values) if query in value]
+
+        candidates = None
+        for gram in {query[i:i + 3] for i in range(len(query) - 2)}:
+            codes = self.grams.get(gram)
+            if codes is None:
+                return []
+            candidates = codes if candidates is None else np.intersect1d(candidates, codes, assume_unique=True)
+        return [code for code in candidates.tolist() if query in self.values[code]]
+
+
+def _date_ns(df, start=0):
+    """Dates of ``df`` from row ``start`` on as int64 nanoseconds, and a mask of the rows that have one"""
+    dates = df['date'].to_numpy(dtype='datetime64[ns]')[start:]
+    return dates.astype('int64'), ~np.isnat(dates)
+
+
+class DateIndex:
+    """Row ids ordered by date, so a date range is a contiguous slice found by binary search"""
+
+    def __init__(self, df):
+        dates, valid = _date_ns(df)
+        self.by_row = dates
+        rows = np.flatnonzero(valid)
+        order = np.argsort(dates[rows], kind='stable')
+        self.rows = rows[order]
+        self.dates = dates[self.rows]
+
+    def extend(self, dataset, start):
+        """Return an index that also holds the rows of ``dataset`` from position ``start`` on"""
+        dates, valid = _date_ns(dataset.df, start)
+        rows = np.flatnonzero(valid)
+        order = np.argsort(dates[rows], kind='stable')
+        new_dates = dates[rows[order]]
+        positions = np.searchsorted(self.dates, new_dates, side='right')
+        index = DateIndex.__new__(DateIndex)
+        index.by_row = np.concatenate([self.by_row, dates])
+        index.rows = np.insert(self.rows, positions, rows[order] + start)
+        index.dates = np.insert(self.dates, positions, new_dates)
+        return index
+
+    @property
+    def latest(self):
+        """The latest incident date, or None if no row has a date"""
+        return pd.Timestamp(int(self.dates[-1])) if len(self.dates) else None
+
+    def window(self, date_from=None, date_to=None, days=None):
+        """Resolve filter values to an inclusive (start, end) range of int64 nanoseconds, or None for no filter.
+
+        ``days`` selects the last N days up to the latest incident date and
+        overrides ``date_from``/``date_to``, which are whole days (YYYY-MM-DD).
+        Raises ValueError for dates that cannot be parsed.
+        """
+        if days:
+            if self.latest is None:
+                return 0, -1
+            end = self.latest.normalize().value + DAY_NS
+            # Clamped so windows reaching before the earliest representable date cover everything
+            return max(end - int(days) * DAY_NS, np.iinfo('int64').min + 1), end - 1
+        if not date_from and not date_to:
+            return None
+        try:
+            start = pd.Timestamp(date_from).normalize().value if date_from else np.iinfo('int64').min
+            end = (pd.Timestamp(date_to).normalize().value + DAY_NS - 1) if date_to else np.iinfo('int64').max
+        except (OverflowError, pd.errors.OutOfBoundsDatetime) as e:
+            # Outside the nanosecond timestamp range
+            raise ValueError(str(e)) from e
+        return start, end
+
+    def rows_between(self, start, end):
+        """Sorted row ids dated within the inclusive nanosecond range"""
+        lo = np.searchsorted(self.dates, max(start, np.iinfo('int64').min + 1), side='left')
+        hi = np.searchsorted(self.dates, end, side='right')
+        return np.sort(self.rows[lo:hi])
+
+    def narrow(self, rows, start, end):
+        """Keep the sorted row ids in ``rows`` dated within the inclusive nanosecond range"""
+        dates = self.by_row[rows]
+        # NaT is the int64 minimum, so rows without a date fall outside any range that has a start
+        return rows[(dates >= max(start, np.iinfo('int64').min + 1)) & (dates <= end)]
+
+
+class FilterIndex:
+    """Per-dimension inverted indexes over the categorical filter columns.
+
+    Each filter resolves to a sorted array of row ids without scanning the
+    rows, and combined filters are intersections of those arrays.
+    """
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.columns = {}
+        for column in ('crime_type', 'severity', 'location_description'):
+            if column in df.columns:
+                categorical = df[column].astype('category')
+                categories = categorical.cat.categories.astype(str).tolist()
+                self.columns[column] = (categories, Postings(categorical.cat.codes.to_numpy(), len(categories)))
+
+        if 'location_description' in self.columns:
+            self.locations = TrigramIndex(self.columns['location_description'][0])
+        self.dates = DateIndex(df) if 'date' in df.columns else None
+
+    def extend(self, dataset, start):
+        """Return indexes that also cover the rows of ``dataset`` from position ``start`` on.
+
+        Relies on the dataset store appending new categories after the
+        existing ones, so codes already indexed keep their meaning.
+        """
+        index = FilterIndex.__new__(FilterIndex)
+        index.n_rows = len(dataset.df)
+        index.columns = {}
+        for column, (categories, postings) in self.columns.items():
+            values = dataset.df[column]
+            all_categories = values.cat.categories.astype(str).tolist()
+            codes = values.cat.codes.to_numpy()[start:]
+            index.columns[column] = (all_categories, postings.extend(codes, start, len(all_categories)))
+            if column == 'location_description':
+                index.locations = self.locations.extend(all_categories[len(categories):])
+        index.dates = self.dates.extend(dataset, start) if self.dates is not None else None
+        return index
+
+    def values(self, column):
+        """Return the sorted distinct values of a column that occur in at least one row"""
+        if column not in self.columns:
+            return []
+        categories, postings = self.columns[column]
+        return sorted(value for code, value in enumerate(categories) if postings.count(code))
+
+    def _rows(self, column, codes):
+        if column not in self.columns:
+            return EMPTY_ROWS
+        return self.columns[column][1].rows_for(codes)
+
+    def crime_type_rows(self, crime_type):
+        categories = self.columns.get('crime_type', ([], None))[0]
+        return self._rows('crime_type', [code for code, value in enumerate(categories) if value == crime_type])
+
+    def severity_rows(self, severity):
+        severity = severity.lower()
+        categories = self.columns.get('severity', ([], None))[0]
+        return self._rows('severity', [code for code, value in enumerate(categories) if value.lower() == severity])
+
+    def location_rows(self, location):
+        if 'location_description' not in self.columns:
+            return EMPTY_ROWS
+        return self._rows('location_description', self.locations.search(location))
+
+    def filter_rows(self, location_filter='', crime_type_filter='', severity_filter='', date_from=None, date_to=None,
+                    days=None):
+        """Return sorted row ids matching all filters, or None when no filter applies.
+
+        The date range is applied last: on the rows the other filters left, or
+        as a slice of the date-ordered rows when it is the only filter.
+        """
+        selections = []
+        if location_filter and location_filter.lower() != 'all':
+            selections.append(self.location_rows(location_filter))
+        if crime_type_filter and crime_type_filter != 'All':
+            selections.append(self.crime_type_rows(crime_type_filter))
+        if severity_filter and severity_filter != 'All':
+            selections.append(self.severity_rows(severity_filter))
+        window = None
+        if date_from or date_to or days:
+            if self.dates is None:
+                return EMPTY_ROWS
+            window = self.dates.window(date_from, date_to, days)
+
+        if not selections:
+            return None if window is None else self.dates.rows_between(*window)
+        selections.sort(key=len)
+        rows = selections[0]
+        for other in selections[1:]:
+            rows = intersect_sorted(rows, other)
+        if window is not None:
+            rows = self.dates.narrow(rows, *window)
+        return rows
+
+
+def filter_index(dataset):
+    """Return the filter indexes for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('filter_index', lambda data: FilterIndex(data.df))
@@ -0,0 +1,137 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+# Search keys start at the beginning of every word, so "market" finds "Vijayawada Market"
+WORD_START = re.compile(r'\b\w')
+
+
+def _codes(df, column, start):
+    """Category codes of ``df[column]`` from row ``start`` on, and all its categories"""
+    if column not in df.columns:
+        return None, []
+    values = df[column]
+    if not hasattr(values, 'cat'):
+        values = values.astype('category')
+    return values.cat.codes.to_numpy()[start:].astype('int64'), values.cat.categories.astype(str).tolist()
+
+
+def _grown(array, shape):
+    """``array`` zero-padded to ``shape``"""
+    grown = np.zeros(shape, dtype=array.dtype)
+    grown[tuple(slice(0, n) for n in array.shape)] = array
+    return grown
+
+
+class Gazetteer:
+    """Summary of every distinct location: centroid, incident count and breakdowns by type and severity.
+
+    Names are kept in a sorted list of word-prefix keys, so a lookup by
+    name is a dict access and a typeahead query is a binary search.
+    """
+
+    def __init__(self, df):
+        self.names = []
+        self.codes = {}
+        self.counts = np.zeros(0, dtype='int64')
+        self.coordinate_counts = np.zeros(0, dtype='int64')
+        self.lat_sums = np.zeros(0)
+        self.lng_sums = np.zeros(0)
+        self.crime_types = []
+        self.by_crime_type = np.zeros((0, 0), dtype='int64')
+        self.severities = []
+        self.by_severity = np.zeros((0, 0), dtype='int64')
+        self.keys = []
+        self._add(df, 0)
+
+    def _add(self, df, start):
+        """Count the rows of ``df`` from position ``start`` on"""
+        codes, names = _codes(df, 'location_description', start)
+        if codes is None:
+            return
+        n = len(names)
+        valid = codes >= 0
+        located = codes[valid]
+
+        new_names = names[len(self.names):]
+        self.codes.update((name, code) for code, name in enumerate(new_names, len(self.names)))
+        self.keys = sorted(self.keys + [(name.lower()[match.start():], code)
+                                        for code, name in enumerate(new_names, len(self.names))
+                                        for match in WORD_START.finditer(name.lower())])
+        self.names = names
+        self.counts = _grown(self.counts, n) + np.bincount(located, minlength=n)
+
+        self.coordinate_counts = _grown(self.coordinate_counts, n)
+        self.lat_sums = _grown(self.lat_sums, n)
+        self.lng_sums = _grown(self.lng_sums, n)
+        if 'latitude' in df.columns and 'longitude' in df.columns:
+            lat = df['latitude'].to_numpy(dtype='float64', na_value=np.nan)[start:][valid]
+            lng = df['longitude'].to_numpy(dtype='float64', na_value=np.nan)[start:][valid]
+            has_coordinates = ~(np.isnan(lat) | np.isnan(lng))
+            self.coordinate_counts += np.bincount(located[has_coordinates], minlength=n)
+            self.lat_sums += np.bincount(located[has_coordinates], weights=lat[has_coordinates], minlength=n)
+            self.lng_sums += np.bincount(located[has_coordinates], weights=lng[has_coordinates], minlength=n)
+
+        for column, attribute, matrix in (('crime_type', 'crime_types', 'by_crime_type'),
+                                          ('severity', 'severities', 'by_severity')):
+            values, categories = _codes(df, column, start)
+            if values is None:
+                continue
+            values = values[valid]
+            known = values >= 0
+            width = len(categories)
+            counts = np.bincount(located[known] * width + values[known], minlength=n * width).reshape(n, width)
+            setattr(self, attribute, categories)
+            setattr(self, matrix, _grown(getattr(self, matrix), (n, width)) + counts)
+
+    def extend(self, dataset, start):
+        """Return a gazetteer that also counts the rows of ``dataset`` from position ``start`` on"""
+        gazetteer = Gazetteer.__new__(Gazetteer)
+        gazetteer.__dict__.update(self.__dict__)
+        gazetteer.codes = dict(self.codes)
+        gazetteer._add(dataset.df, start)
+        return gazetteer
+
+    def suggest(self, query, limit=10):
+        """Names with a word starting with ``query`` (case-insensitive), at most ``limit`` of them"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        suggestions = []
+        seen = set()
+        i = bisect_left(self.keys, (query,))
+        while i < len(self.keys) and len(suggestions) < limit and self.keys[i][0].startswith(query):
+            code = self.keys[i][1]
+            i += 1
+            if code not in seen and self.counts[code]:
+                seen.add(code)
+                suggestions.append({'name': self.names[code], 'count': int(self.counts[code])})
+        return suggestions
+
+    def details(self, name):
+        """Centroid, incident count and breakdowns of a location, or None if it has no incidents"""
+        code = self.codes.get(name)
+        if code is None or not self.counts[code]:
+            return None
+        located = self.coordinate_counts[code]
+        return {
+            'name': name,
+            'latitude': round(float(self.lat_sums[code] / located), 5) if located else None,
+            'longitude': round(float(self.lng_sums[code] / located), 5) if located else None,
+            'crime_count': int(self.counts[code]),
+            'crime_by_type': _breakdown(self.crime_types, self.by_crime_type, code),
+            'severity_counts': _breakdown(self.severities, self.by_severity, code)
+        }
+
+
+def _breakdown(categories, matrix, code):
+    if not len(matrix):
+        return {}
+    counts = matrix[code]
+    return {categories[i]: int(counts[i]) for i in np.argsort(-counts, kind='stable') if counts[i]}
+
+
+def gazetteer(dataset):
+    """Return the location gazetteer for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('gazetteer', lambda data: Gazetteer(data.df))
@@ -0,0 +1,39 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km between points given in degrees (NumPy broadcasting)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype='float64')) for v in (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def degree_span(lat, radius_km):
+    """Return the (lat, lng) extent in degrees that a circle of ``radius_km`` around ``lat`` covers"""
+    lat_span = radius_km / KM_PER_DEGREE_LAT
+    edge_lat = min(abs(lat) + lat_span, 90.0)
+    cos_lat = np.cos(np.radians(edge_lat))
+    lng_span = 360.0 if cos_lat < 1e-9 else min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 360.0)
+    return lat_span, lng_span
+
+
+def mercator_xy(lat, lng):
+    """Project degrees to Web Mercator coordinates normalised to [0, 1), y growing southwards"""
+    lat = np.clip(np.asarray(lat, dtype='float64'), -85.05112878, 85.05112878)
+    lng = np.asarray(lng, dtype='float64')
+    x = (lng + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1.0 + sin_lat) / (1.0 - sin_lat)) / (4.0 * np.pi)
+    return np.clip(x, 0.0, 1.0 - 1e-12), np.clip(y, 0.0, 1.0 - 1e-12)
+
+
+def mercator_latlng(x, y):
+    """Inverse of ``mercator_xy``: normalised Web Mercator coordinates back to (lat, lng) degrees"""
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * y))))
+    return lat, x * 360.0 - 180.0
@@ -0,0 +1,156 @@
+import numpy as np
+
+from utils.geo import mercator_xy, mercator_latlng
+from utils.clustering import severity_codes, MAX_ZOOM, SEVERITY_LEVELS
+
+# Heat cells are this many screen pixels wide at every zoom level
+HEAT_CELL_PX = 16
+# Relative weight of low, medium, high and unknown severity incidents
+SEVERITY_WEIGHTS = np.array([1.0, 2.0, 3.0, 1.0])
+# Standard deviation of the smoothing kernel, in cells
+SMOOTHING_SIGMA = 1.0
+# Viewports covering more cells than this are not smoothed
+MAX_SMOOTHED_CELLS = 1 << 20
+# Smoothed cells weaker than this fraction of the strongest one are dropped
+MIN_SMOOTHED_WEIGHT = 0.01
+
+
+def heat_cells_per_axis(zoom):
+    return (2 ** zoom) * 256 // HEAT_CELL_PX
+
+
+class HeatLevel:
+    """Incident counts per severity in the occupied heat cells of one zoom level, sorted by (y, x)"""
+
+    def __init__(self, zoom, keys, counts):
+        self.zoom = zoom
+        self.dim = heat_cells_per_axis(zoom)
+        self.keys = keys
+        self.counts = counts
+
+    @classmethod
+    def aggregate(cls, zoom, keys, counts):
+        """Sum the counts of entries with the same cell key"""
+        keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        merged = np.column_stack([
+            np.bincount(inverse, weights=counts[:, column], minlength=len(keys))
+            for column in range(counts.shape[1])
+        ]).astype('int64').reshape(len(keys), counts.shape[1])
+        return cls(zoom, keys, merged)
+
+    @classmethod
+    def from_points(cls, zoom, lat, lng, severity):
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        x, y = mercator_xy(lat[valid], lng[valid])
+        dim = heat_cells_per_axis(zoom)
+        keys = (y * dim).astype('int64') * dim + (x * dim).astype('int64')
+        counts = np.zeros((len(keys), len(SEVERITY_LEVELS) + 1), dtype='int64')
+        counts[np.arange(len(keys)), severity[valid]] = 1
+        return cls.aggregate(zoom, keys, counts)
+
+    def coarser(self):
+        """Build the next zoom level out by merging 2x2 blocks of cells"""
+        x, y = self.keys % self.dim // 2, self.keys // self.dim // 2
+        return HeatLevel.aggregate(self.zoom - 1, y * (self.dim // 2) + x, self.counts)
+
+    def merge(self, other):
+        return HeatLevel.aggregate(self.zoom, np.concatenate([self.keys, other.keys]),
+                                   np.concatenate([self.counts, other.counts]))
+
+    def points(self, west=None, south=None, east=None, north=None, weighted=True, smooth=False):
+        """Return an (n, 3) array of cell centre lat, lng and weight in (0, 1] for the cells in a bounding box"""
+        if not len(self.keys):
+            return np.empty((0, 3))
+        if west is None:
+            # Without a bounding box, cover the occupied cells
+            x0, x1 = int((self.keys % self.dim).min()), int((self.keys % self.dim).max())
+            y0, y1 = int(self.keys[0] // self.dim), int(self.keys[-1] // self.dim)
+        else:
+            (fx0, fx1), (fy1, fy0) = mercator_xy([south, north], [west, east])
+            x0, x1, y0, y1 = (int(v * self.dim) for v in (fx0, fx1, fy0, fy1))
+        if smooth:
+            # Cells just outside the box still spread into it
+            margin = int(np.ceil(3 * SMOOTHING_SIGMA))
+            x0, y0 = max(x0 - margin, 0), max(y0 - margin, 0)
+            x1, y1 = min(x1 + margin, self.dim - 1), min(y1 + margin, self.dim - 1)
+
+        cell_x, cell_y = self.keys % self.dim, self.keys // self.dim
+        inside = (cell_x >= x0) & (cell_x <= x1) & (cell_y >= y0) & (cell_y <= y1)
+        cell_x, cell_y, counts = cell_x[inside], cell_y[inside], self.counts[inside]
+        weights = counts @ SEVERITY_WEIGHTS if weighted else counts.sum(axis=1).astype('float64')
+
+        if smooth and len(weights) and (x1 - x0 + 1) * (y1 - y0 + 1) <= MAX_SMOOTHED_CELLS:
+            dense = np.zeros((y1 - y0 + 1, x1 - x0 + 1))
+            dense[cell_y - y0, cell_x - x0] = weights
+            dense = gaussian_blur(dense, SMOOTHING_SIGMA)
+            cell_y, cell_x = np.nonzero(dense > dense.max() * MIN_SMOOTHED_WEIGHT)
+            weights = dense[cell_y, cell_x]
+            cell_x, cell_y = cell_x + x0, cell_y + y0
+
+        if not len(weights):
+            return np.empty((0, 3))
+        lat, lng = mercator_latlng((cell_x + 0.5) / self.dim, (cell_y + 0.5) / self.dim)
+        return np.column_stack([lat, lng, weights / weights.max()])
+
+
+def gaussian_blur(grid, sigma):
+    """Separable Gaussian blur of a 2-D array, computed as shifted sums over each axis"""
+    radius = int(np.ceil(3 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-offsets ** 2 / (2.0 * sigma ** 2))
+    kernel /= kernel.sum()
+    for axis in (0, 1):
+        padded = np.pad(grid, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)])
+        size = grid.shape[axis]
+        grid = sum(weight * padded.take(np.arange(i, i + size), axis=axis) for i, weight in enumerate(kernel))
+    return grid
+
+
+class HeatGrid:
+    """Severity counts of the incidents binned into heat cells at every zoom level.
+
+    Like the cluster hierarchy, only occupied cells are stored and each
+    level is derived from the one below it. A heat layer then receives at
+    most one weighted point per cell in the viewport, however many
+    incidents there are.
+    """
+
+    def __init__(self, lat, lng, severity):
+        level = HeatLevel.from_points(MAX_ZOOM, lat, lng, severity)
+        self.levels = [None] * (MAX_ZOOM + 1)
+        self.levels[MAX_ZOOM] = level
+        for zoom in range(MAX_ZOOM - 1, -1, -1):
+            level = level.coarser()
+            self.levels[zoom] = level
+
+    @classmethod
+    def from_frame(cls, df):
+        if 'latitude' not in df.columns or 'longitude' not in df.columns:
+            return cls([], [], np.empty(0, dtype='int64'))
+        return cls(df['latitude'].to_numpy(), df['longitude'].to_numpy(), severity_codes(df))
+
+    def extend(self, dataset, start):
+        """Return a grid that also counts the rows of ``dataset`` from position ``start`` on"""
+        added = HeatGrid.from_frame(dataset.df.iloc[start:])
+        grid = HeatGrid.__new__(HeatGrid)
+        grid.levels = [level.merge(new) for level, new in zip(self.levels, added.levels)]
+        return grid
+
+    def level(self, zoom):
+        return self.levels[int(min(max(zoom, 0), MAX_ZOOM))]
+
+
+def heat_level(df, zoom):
+    """Bin the rows of ``df`` (e.g. a filtered selection) into the heat cells of one zoom level"""
+    zoom = int(min(max(zoom, 0), MAX_ZOOM))
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        return HeatLevel.from_points(zoom, [], [], np.empty(0, dtype='int64'))
+    return HeatLevel.from_points(zoom, df['latitude'].to_numpy(), df['longitude'].to_numpy(), severity_codes(df))
+
+
+def heat_grid(dataset):
+    """Return the heat grid for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('heat_grid', lambda data: HeatGrid.from_frame(data.df))
@@ -0,0 +1,210 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.geo import KM_PER_DEGREE_LAT
+from utils.clustering import SEVERITY_LEVELS
+from utils.render_cache import RenderCache
+
+DEFAULT_CELL_KM = 0.5
+DEFAULT_MIN_INCIDENTS = 10
+# Poisson z-score a cluster needs to be reported (about p < 0.05, one-sided)
+DEFAULT_MIN_Z = 1.645
+HOTSPOT_THREADS = int(os.environ.get('CRIME_MAP_HOTSPOT_THREADS', os.cpu_count() or 1))
+# Below this many occupied cells the neighbor search is not worth splitting across threads
+PARALLEL_MIN_CELLS = 50000
+
+# Ranked hotspots per dataset version, data file and parameters
+hotspot_cache = RenderCache(int(os.environ.get('CRIME_MAP_HOTSPOT_CACHE_BYTES', 8 * 1024 * 1024)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _map_chunks(func, n):
+    """Apply ``func(start, stop)`` to slices of ``range(n)``, in parallel when ``n`` is large"""
+    global _executor
+    if n < PARALLEL_MIN_CELLS or HOTSPOT_THREADS <= 1:
+        return [func(0, n)]
+    with _executor_lock:
+        # Concurrent first requests would otherwise each start a pool and leak all but one
+        if _executor is None:
+            _executor = ThreadPoolExecutor(HOTSPOT_THREADS, thread_name_prefix='hotspots')
+        executor = _executor
+    bounds = np.linspace(0, n, HOTSPOT_THREADS + 1).astype('int64')
+    # NumPy releases the GIL in searchsorted and the arithmetic, so the chunks run concurrently
+    return list(executor.map(func, bounds[:-1], bounds[1:]))
+
+
+def _components(n, a, b):
+    """Connected component label (smallest member) of each of ``n`` nodes joined by edges ``a[i]-b[i]``"""
+    labels = np.arange(n)
+    while True:
+        before = labels.copy()
+        # Hook each root onto the smallest root it has an edge to, then flatten the trees
+        root_a, root_b = labels[a], labels[b]
+        low = np.minimum(root_a, root_b)
+        np.minimum.at(labels, root_a, low)
+        np.minimum.at(labels, root_b, low)
+        while True:
+            flattened = labels[labels]
+            if (flattened == labels).all():
+                break
+            labels = flattened
+        if (labels == before).all():
+            return labels
+
+
+class HotspotGrid:
+    """Incidents binned into square cells of ``cell_km`` on an equirectangular projection.
+
+    The projection is scaled at the mean latitude of the points, so cells
+    stay within a few percent of square over a region the size of a state.
+    """
+
+    def __init__(self, lat, lng, severity, cell_km):
+        self.cell_km = cell_km
+        self.lat_ref = float(lat.mean()) if len(lat) else 0.0
+        y = np.floor(lat * KM_PER_DEGREE_LAT / cell_km).astype('int64')
+        x = np.floor(lng * KM_PER_DEGREE_LAT * np.cos(np.radians(self.lat_ref)) / cell_km).astype('int64')
+        self.y0, self.x0 = (int(y.min()) - 1, int(x.min()) - 1) if len(lat) else (0, 0)
+        self.width = int(x.max()) - self.x0 + 2 if len(lat) else 1
+
+        self.keys, inverse = np.unique((y - self.y0) * self.width + (x - self.x0), return_inverse=True)
+        n = len(self.keys)
+        self.count = np.bincount(inverse, minlength=n)
+        self.lat_sum = np.bincount(inverse, weights=lat, minlength=n)
+        self.lng_sum = np.bincount(inverse, weights=lng, minlength=n)
+        self.lat_min = np.full(n, np.inf)
+        self.lat_max = np.full(n, -np.inf)
+        self.lng_min = np.full(n, np.inf)
+        self.lng_max = np.full(n, -np.inf)
+        np.minimum.at(self.lat_min, inverse, lat)
+        np.maximum.at(self.lat_max, inverse, lat)
+        np.minimum.at(self.lng_min, inverse, lng)
+        np.maximum.at(self.lng_max, inverse, lng)
+        self.severity = np.column_stack([
+            np.bincount(inverse[severity == code], minlength=n) for code in range(len(SEVERITY_LEVELS))
+        ]) if n else np.zeros((0, len(SEVERITY_LEVELS)), dtype='int64')
+
+    def neighbors(self, cells, dy):
+        """Positions of the cells at (dy, -1), (dy, 0) and (dy, 1) from each of ``cells``, -1 where empty.
+
+        Keys are unique and sorted, so one binary search finds the left
+        neighbor's slot and the other two are at most one step further.
+        """
+        targets = self.keys[cells] + dy * self.width - 1
+        slots = np.searchsorted(self.keys, targets)
+        last = len(self.keys) - 1
+        found = []
+        for dx in (-1, 0, 1):
+            positions = slots.clip(max=last)
+            hit = self.keys[positions] == targets + (dx + 1)
+            found.append(np.where(hit, positions, -1))
+            slots = slots + hit
+        return found
+
+    def neighborhood_counts(self):
+        """Incidents in the 3x3 block of cells around every occupied cell"""
+        def count(start, stop):
+            totals = np.zeros(stop - start, dtype='int64')
+            for dy in (-1, 0, 1):
+                for positions in self.neighbors(slice(start, stop), dy):
+                    totals += np.where(positions >= 0, self.count[positions], 0)
+            return totals
+        return np.concatenate(_map_chunks(count, len(self.keys))) if len(self.keys) else np.zeros(0, dtype='int64')
+
+    def adjacent_pairs(self, cells):
+        """(i, j) position pairs of 8-connected cells, both in the boolean mask ``cells``"""
+        def pairs(start, stop):
+            found = []
+            own = np.arange(start, stop)
+            for dy in (-1, 0, 1):
+                for positions in self.neighbors(slice(start, stop), dy):
+                    keep = (positions >= 0) & (positions != own) & cells[start:stop]
+                    keep[keep] &= cells[positions[keep]]
+                    found.append((own[keep], positions[keep]))
+            return found
+        chunks = [pair for chunk in _map_chunks(pairs, len(self.keys)) for pair in chunk]
+        if not chunks:
+            return np.zeros(0, dtype='int64'), np.zeros(0, dtype='int64')
+        return np.concatenate([i for i, _ in chunks]), np.concatenate([j for _, j in chunks])
+
+
+def detect_hotspots(lat, lng, severity, cell_km=DEFAULT_CELL_KM, min_incidents=DEFAULT_MIN_INCIDENTS,
+                    min_z=DEFAULT_MIN_Z, limit=None):
+    """Find dense clusters of incidents, ranked by how far they exceed the average density.
+
+    A DBSCAN run on cells instead of points: a cell is a core cell when its
+    3x3 block holds at least ``min_incidents`` incidents, 8-connected core
+    cells form a cluster, and occupied cells touching a cluster are its
+    border. Each cluster's count is compared with a Poisson expectation of
+    the mean incidents per occupied cell times its cells; clusters with a
+    z-score below ``min_z`` are dropped.
+    """
+    lat = np.asarray(lat, dtype='float64')
+    lng = np.asarray(lng, dtype='float64')
+    severity = np.asarray(severity)
+    valid = np.isfinite(lat) & np.isfinite(lng)
+    lat, lng, severity = lat[valid], lng[valid], severity[valid]
+    if not len(lat):
+        return []
+
+    grid = HotspotGrid(lat, lng, severity, cell_km)
+    core = grid.neighborhood_counts() >= min_incidents
+    if not core.any():
+        return []
+
+    # Clusters of core cells, then each border cell joins the first adjacent cluster
+    core_positions = np.flatnonzero(core)
+    a, b = grid.adjacent_pairs(core)
+    compact = np.full(len(grid.keys), -1)
+    compact[core_positions] = np.arange(len(core_positions))
+    labels = np.full(len(grid.keys), -1)
+    labels[core_positions] = core_positions[_components(len(core_positions), compact[a], compact[b])]
+    for dy in (-1, 0, 1):
+        border = np.flatnonzero(labels < 0)
+        for positions in grid.neighbors(border, dy):
+            joined = (positions >= 0) & (labels[border] < 0)
+            joined[joined] &= core[positions[joined]]
+            labels[border[joined]] = labels[positions[joined]]
+
+    members = np.flatnonzero(labels >= 0)
+    cluster_ids, inverse = np.unique(labels[members], return_inverse=True)
+    n = len(cluster_ids)
+    count = np.bincount(inverse, weights=grid.count[members], minlength=n)
+    cells = np.bincount(inverse, minlength=n)
+    expected = cells * (len(lat) / len(grid.keys))
+    z_score = (count - expected) / np.sqrt(expected)
+    lat_center = np.bincount(inverse, weights=grid.lat_sum[members], minlength=n) / count
+    lng_center = np.bincount(inverse, weights=grid.lng_sum[members], minlength=n) / count
+    bounds = []
+    for values, reduce, initial in ((grid.lng_min, np.minimum, np.inf), (grid.lat_min, np.minimum, np.inf),
+                                    (grid.lng_max, np.maximum, -np.inf), (grid.lat_max, np.maximum, -np.inf)):
+        bound = np.full(n, initial)
+        reduce.at(bound, inverse, values[members])
+        bounds.append(bound)
+    severity_counts = np.column_stack([
+        np.bincount(inverse, weights=grid.severity[members, code], minlength=n) for code in range(len(SEVERITY_LEVELS))
+    ]).astype('int64')
+
+    order = [i for i in np.argsort(-z_score, kind='stable') if z_score[i] >= min_z]
+    if limit is not None:
+        order = order[:limit]
+    return [
+        {
+            'rank': rank,
+            'lat': round(float(lat_center[i]), 5),
+            'lng': round(float(lng_center[i]), 5),
+            'bounds': [round(float(bound[i]), 5) for bound in bounds],
+            'count': int(count[i]),
+            'cells': int(cells[i]),
+            'area_km2': round(float(cells[i] * cell_km ** 2), 3),
+            'expected': round(float(expected[i]), 2),
+            'z_score': round(float(z_score[i]), 2),
+            'severity': {name: int(severity_counts[i, code]) for code, name in enumerate(SEVERITY_LEVELS)}
+        }
+        for rank, i in enumerate(order, 1)
+    ]
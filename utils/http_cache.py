@@ -0,0 +1,103 @@
+"""Conditional GET and compression for responses that only change with the data.
+
+Read endpoints are wrapped with ``conditional(validators)``, where
+``validators()`` returns the version of everything the response depends on
+and the time it last changed. The version becomes a weak ETag and the time
+the Last-Modified header, so a client revalidating an unchanged response
+gets a 304 without the view running at all.
+
+Large bodies are compressed with brotli (when the ``brotli`` package is
+installed) or gzip, whichever the client prefers, and the compressed bytes
+are cached per version: repeat requests from other clients are served
+without rendering or compressing again.
+"""
+import gzip
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+from werkzeug.http import is_resource_modified
+
+from utils.render_cache import RenderCache
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('CRIME_WEB_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+response_cache = RenderCache(int(os.environ.get('CRIME_WEB_RESPONSE_CACHE_BYTES', 32 * 1024 * 1024)))
+
+
+def accepted_encoding(accept_encodings):
+    """The preferred encoding out of those we can produce, or None for identity"""
+    offered = (['br'] if brotli is not None else []) + ['gzip']
+    quality, encoding = max((accept_encodings[name], name) for name in offered)
+    if quality <= 0:
+        return None
+    return encoding
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Always revalidate so new incidents show up on the next refresh
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def conditional(validators):
+    """Decorate a GET view whose response is determined by its URL and ``validators()``.
+
+    ``validators()`` returns ``(version, last_modified)``: a string that
+    changes whenever the response may change, and a Unix timestamp or None.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                version, last_modified = validators()
+            except Exception as e:
+                print(f"Error computing response validators: {e}")
+                return view(*args, **kwargs)
+            if last_modified is not None:
+                last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+
+            if not is_resource_modified(request.environ, etag=f'W/"{version}"', last_modified=last_modified):
+                return _set_validators(make_response('', 304), version, last_modified)
+
+            encoding = accepted_encoding(request.accept_encodings)
+            key = (request.full_path, encoding)
+            cached = response_cache.get(version, key) if encoding else None
+            if cached is not None:
+                body, mimetype = cached
+                response = make_response(body)
+                response.mimetype = mimetype
+                response.content_encoding = encoding
+                return _set_validators(response, version, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            if encoding and not response.is_streamed and response.content_encoding is None:
+                body = response.get_data()
+                if len(body) >= COMPRESS_MIN_BYTES:
+                    body = compress(body, encoding)
+                    response.set_data(body)
+                    response.content_encoding = encoding
+                    response_cache.put(version, key, (body, response.mimetype), size=len(body))
+            return _set_validators(response, version, last_modified)
+        return wrapper
+    return decorator
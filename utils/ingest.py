@@ -0,0 +1,265 @@
+"""Append-only ingestion of new incidents into the crime CSV.
+
+New rows are validated and appended to the data file. Every process using
+the dataset store then picks them up incrementally: only the appended
+lines are parsed and derived structures are extended rather than rebuilt.
+
+Follow a growing NDJSON or CSV file and ingest whatever is appended to it:
+
+    python -m utils.ingest follow incoming.ndjson --data data/crime_data.csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from utils.data_store import load_dataset
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+REQUIRED_FIELDS = ['crime_type', 'severity', 'latitude', 'longitude', 'location_description']
+SEVERITIES = {'low': 'Low', 'medium': 'Medium', 'high': 'High'}
+MAX_BATCH_SIZE = 10000
+# Incidents dated before this are rejected as typos; later than today is rejected too
+EARLIEST_DATE = pd.Timestamp(os.environ.get('CRIME_MAP_EARLIEST_DATE', '1990-01-01'))
+# Newlines would split a record across CSV lines for readers following the file
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f]')
+
+_append_lock = threading.Lock()
+
+
+def validate_incident(record):
+    """Return (row, None) for a valid incident or (None, error message)"""
+    if not isinstance(record, dict):
+        return None, 'incident must be an object'
+
+    missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, '')]
+    if missing:
+        return None, f"missing fields: {', '.join(missing)}"
+
+    try:
+        lat = float(record['latitude'])
+        lng = float(record['longitude'])
+    except (TypeError, ValueError):
+        return None, 'latitude and longitude must be numbers'
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None, 'coordinates out of range'
+
+    severity = SEVERITIES.get(str(record['severity']).strip().lower())
+    if severity is None:
+        return None, 'severity must be Low, Medium or High'
+
+    for field in ('crime_type', 'location_description'):
+        if CONTROL_CHARACTERS.search(str(record[field])):
+            return None, f'{field} must not contain newlines or control characters'
+
+    today = pd.Timestamp.now().normalize()
+    raw_date = record.get('date')
+    if raw_date in (None, ''):
+        date = today
+    elif isinstance(raw_date, str):
+        date = pd.to_datetime(raw_date, errors='coerce')
+    else:
+        # Numbers would be read as nanoseconds since the epoch
+        return None, 'date must be a YYYY-MM-DD string'
+    if pd.isna(date):
+        return None, 'date is not a valid date'
+    if date.tz is not None:
+        date = date.tz_convert(None)
+    if date < EARLIEST_DATE or date.normalize() > today:
+        return None, f"date must be between {EARLIEST_DATE.strftime('%Y-%m-%d')} and today"
+
+    return {
+        'crime_type': str(record['crime_type']).strip(),
+        'date': date.strftime('%Y-%m-%d'),
+        'severity': severity,
+        'latitude': round(lat, 6),
+        'longitude': round(lng, 6),
+        'location_description': str(record['location_description']).strip()
+    }, None
+
+
+def validate_incidents(records):
+    """Split records into valid rows and a list of {'index', 'error'} rejections"""
+    rows, errors = [], []
+    for i, record in enumerate(records):
+        row, error = validate_incident(record)
+        if error:
+            errors.append({'index': i, 'error': error})
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def _write_rows(csv_file, rows):
+    """Append rows to the CSV, numbering ids after the current maximum"""
+    with open(csv_file, 'rb+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            # Reload under the lock so ids continue from rows other processes appended
+            df = load_dataset(csv_file).df
+            columns = list(df.columns)
+            next_id = int(df['id'].max()) + 1 if 'id' in columns and df['id'].notna().any() else 1
+
+            text = io.StringIO()
+            writer = csv.writer(text, lineterminator='\n')
+            for row in rows:
+                if 'id' in columns:
+                    row['id'] = next_id
+                    next_id += 1
+                writer.writerow([row.get(column, '') for column in columns])
+
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write(text.getvalue().encode('utf-8'))
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def append_incidents(csv_file, records):
+    """Validate incidents and append the valid ones to the dataset"""
+    rows, errors = validate_incidents(records)
+    if rows:
+        with _append_lock:
+            _write_rows(csv_file, rows)
+
+    return {
+        'accepted': len(rows),
+        'rejected': errors,
+        'total': len(load_dataset(csv_file).df)
+    }
+
+
+class IncidentFollower(threading.Thread):
+    """Follow a growing NDJSON or CSV file and ingest the complete lines appended to it"""
+
+    def __init__(self, source, csv_file, interval=1.0, from_start=False):
+        super().__init__(daemon=True)
+        self.source = source
+        self.csv_file = csv_file
+        self.interval = interval
+        self.is_csv = source.lower().endswith('.csv')
+        self.offset = 0 if from_start or not os.path.exists(source) else os.path.getsize(source)
+        self.header = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                result = self.poll()
+                if result and (result['accepted'] or result['rejected']):
+                    print(f"Ingested {result['accepted']} incidents from {self.source}, "
+                          f"rejected {len(result['rejected'])}")
+            except Exception as e:
+                print(f"Error following {self.source}: {e}")
+            self._stop_event.wait(self.interval)
+
+    def _record(self, line):
+        """The incident on one source line, or None for a blank line; raises ValueError or csv.Error if unreadable"""
+        text = line.decode('utf-8').rstrip('\r')
+        if not text.strip():
+            return None
+        if not self.is_csv:
+            return json.loads(text)
+        if self.header is None:
+            with open(self.source, newline='', encoding='utf-8', errors='replace') as f:
+                self.header = next(csv.reader(f), [])
+        return next(csv.DictReader([text], fieldnames=self.header))
+
+    def poll(self):
+        """Ingest lines appended since the last poll; returns the append result or None.
+
+        A line is only consumed once it has been handled: unreadable lines
+        are logged and reported as rejected, and the offset moves past a
+        batch only after it has been appended, so a failed append is retried.
+        """
+        if not os.path.exists(self.source):
+            return None
+        size = os.path.getsize(self.source)
+        if size < self.offset:
+            # Truncated or replaced: start over
+            self.offset = 0
+            self.header = None
+        if size == self.offset:
+            return None
+
+        with open(self.source, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # Only complete lines; a partially written last line is read next time
+        lines = data[:data.rfind(b'\n') + 1].split(b'\n')[:-1]
+        if not lines:
+            return None
+
+        records, rejected = [], []
+        position = self.offset
+        for line in lines:
+            line_start, position = position, position + len(line) + 1
+            if self.is_csv and line_start == 0:
+                self.header = next(csv.reader([line.decode('utf-8', errors='replace').rstrip('\r')]), [])
+                continue
+            try:
+                record = self._record(line)
+            except (ValueError, csv.Error) as e:
+                print(f"Rejected line at byte {line_start} of {self.source}: {e}")
+                rejected.append({'offset': line_start, 'error': f'unreadable line: {e}'})
+                continue
+            if record is not None:
+                records.append((record, line_start, position))
+
+        accepted = 0
+        for batch_start in range(0, len(records), MAX_BATCH_SIZE):
+            batch = records[batch_start:batch_start + MAX_BATCH_SIZE]
+            result = append_incidents(self.csv_file, [record for record, _, _ in batch])
+            accepted += result['accepted']
+            rejected.extend({'offset': batch[error['index']][1], 'error': error['error']}
+                            for error in result['rejected'])
+            self.offset = batch[-1][2]
+        self.offset = position
+        if not records and not rejected:
+            return None
+        return {
+            'accepted': accepted,
+            'rejected': sorted(rejected, key=lambda rejection: rejection['offset']),
+            'total': len(load_dataset(self.csv_file).df)
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest incidents into the crime dataset')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    follow = subparsers.add_parser('follow', help='ingest lines appended to an NDJSON or CSV file')
+    follow.add_argument('source')
+    follow.add_argument('--data', default='data/crime_data.csv')
+    follow.add_argument('--interval', type=float, default=1.0)
+    follow.add_argument('--from-start', action='store_true', help='also ingest lines already in the file')
+    args = parser.parse_args()
+
+    follower = IncidentFollower(args.source, args.data, args.interval, args.from_start)
+    follower.start()
+    try:
+        while follower.is_alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        follower.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Pre-rendered map artifacts for datasets that rarely change.
+
+Rendering the folium map takes most of a second on a large dataset. The
+build command renders the default map and a configurable set of filtered
+maps ahead of time and writes them gzipped to a directory named after the
+content hash of the data file and the neighborhoods file:
+
+    python -m utils.map_artifacts build data/crime_data.csv --crime-types --severities
+    python -m utils.map_artifacts build data/crime_data.csv --filters common_filters.json
+
+``--filters`` takes a JSON list of filter objects with the same fields as
+``POST /filter`` (location, crime_type, severity, neighborhood, date_from,
+date_to, days). The app looks a map up here before rendering it; artifacts
+built from other data are never used, so any change to the data falls back
+to rendering until the artifacts are rebuilt.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+from utils.neighborhoods import NEIGHBORHOODS_FILE
+from utils.render_cache import ERROR_PREFIX, normalize_filters
+
+ARTIFACT_DIR = os.environ.get('CRIME_MAP_ARTIFACT_DIR', 'data/artifacts')
+ARTIFACT_FORMAT = 1
+MANIFEST_FILE = 'manifest.json'
+HASH_CHUNK_BYTES = 1024 * 1024
+
+_manifests = {}
+_neighborhood_hashes = {}
+_lock = threading.Lock()
+
+
+def _hash_file(hasher, path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(HASH_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
+
+
+def content_hash(dataset):
+    """Return the SHA-256 of the data file bytes a ``CrimeDataset`` snapshot was parsed from"""
+    if dataset.digest is not None:
+        return dataset.digest
+    # Snapshots written before the digest was recorded
+    return dataset.derived('content_hash',
+                           lambda data: _hash_file(hashlib.sha256(), data.path, 0, data.offset).hexdigest())
+
+
+def _neighborhoods_hash(path=NEIGHBORHOODS_FILE):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    signature = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _neighborhood_hashes.get(signature)
+    if digest is None:
+        digest = _neighborhood_hashes[signature] = _hash_file(hashlib.sha256(), path, 0, stat.st_size).hexdigest()
+    return digest
+
+
+def artifact_set(dataset):
+    """Name of the artifact directory for a dataset snapshot and the current neighborhoods"""
+    return hashlib.sha256(f'{content_hash(dataset)}:{_neighborhoods_hash()}'.encode()).hexdigest()[:32]
+
+
+def map_key(filters=None):
+    """Artifact key of the default map (no filters) or of a filtered map; a filter dict as for POST /filter"""
+    if filters is None:
+        return ('map',)
+    return ('filtered',) + normalize_filters(
+        filters.get('location', ''), filters.get('crime_type', ''), filters.get('severity', ''),
+        filters.get('neighborhood', ''), filters.get('date_from'), filters.get('date_to'), filters.get('days')
+    )
+
+
+def _manifest(directory):
+    """The manifest of an artifact directory as {key: file name}, or None if there is none.
+
+    Cached per manifest mtime and size: the build runs in another process,
+    so a set that is missing now or gets rebuilt is picked up on a later lookup.
+    """
+    path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _manifests.get(directory)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    try:
+        with open(path) as f:
+            meta = json.load(f)
+        if meta.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"unsupported artifact format {meta.get('format')}")
+        manifest = {tuple(entry['key']): entry['file'] for entry in meta['maps']}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading map artifacts {directory}: {e}")
+        manifest = None
+    with _lock:
+        _manifests[directory] = (signature, manifest)
+    return manifest
+
+
+def load_artifact(dataset, key, root=None):
+    """Return the pre-rendered map HTML for ``key`` built from exactly this data, or None"""
+    root = root or ARTIFACT_DIR
+    if not os.path.isdir(root):
+        return None
+    try:
+        directory = os.path.join(root, artifact_set(dataset))
+        manifest = _manifest(directory)
+        name = manifest.get(tuple(key)) if manifest else None
+        if name is None:
+            return None
+        with open(os.path.join(directory, name), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+    except Exception as e:
+        print(f"Error loading map artifact {key}: {e}")
+        return None
+
+
+def build_artifacts(csv_file, filter_sets=(), root=None, keep_old=False):
+    """Render the default map and one map per filter dict in ``filter_sets`` into a new artifact directory"""
+    from utils.data_store import load_dataset
+    from utils.map_generators import generate_map, generate_filtered_map
+
+    root = root or ARTIFACT_DIR
+    data = load_dataset(csv_file)
+    name = artifact_set(data)
+    directory = os.path.join(root, name)
+    tmp = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    maps = []
+    seen = set()
+    for filters in [None] + list(filter_sets):
+        key = map_key(filters)
+        if key in seen:
+            continue
+        seen.add(key)
+        if filters is None:
+            html = generate_map(csv_file)
+        else:
+            html = generate_filtered_map(
+                csv_file, filters.get('location', ''), filters.get('crime_type', ''), filters.get('severity', ''),
+                filters.get('neighborhood', ''), filters.get('date_from'), filters.get('date_to'), filters.get('days')
+            )
+        if html.startswith(ERROR_PREFIX):
+            print(f"Skipping {filters or 'default map'}: rendering failed")
+            continue
+        file_name = f'map-{len(maps)}.html.gz'
+        with open(os.path.join(tmp, file_name), 'wb') as f:
+            f.write(gzip.compress(html.encode('utf-8'), compresslevel=9))
+        maps.append({'key': list(key), 'filters': filters or {}, 'file': file_name})
+
+    if load_dataset(csv_file).version != data.version:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise RuntimeError(f'{csv_file} changed while the maps were rendered')
+
+    meta = {
+        'format': ARTIFACT_FORMAT,
+        'dataset': content_hash(data),
+        'neighborhoods': _neighborhoods_hash(),
+        'rows': len(data.df),
+        'built_at': time.time(),
+        'maps': maps
+    }
+    with open(os.path.join(tmp, MANIFEST_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    # Swap directories so the app never reads a half-written set
+    old = f'{directory}.old-{os.getpid()}'
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    if not keep_old:
+        for entry in os.listdir(root):
+            if entry != name and os.path.isdir(os.path.join(root, entry)):
+                shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return directory, meta
+
+
+def _filter_sets(args):
+    from utils.data_store import load_dataset
+    from utils.filter_index import filter_index
+
+    filter_sets = []
+    if args.filters:
+        with open(args.filters) as f:
+            filter_sets.extend(json.load(f))
+    if args.crime_types:
+        filter_sets.extend({'crime_type': value}
+                           for value in filter_index(load_dataset(args.csv_file)).values('crime_type'))
+    if args.severities:
+        filter_sets.extend({'severity': value} for value in ('Low', 'Medium', 'High'))
+    return filter_sets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage pre-rendered map artifacts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='pre-render the default map and common filtered maps')
+    build.add_argument('csv_file', nargs='?', default='data/crime_data.csv')
+    build.add_argument('--filters', help='JSON file with a list of filter objects to pre-render')
+    build.add_argument('--crime-types', action='store_true', help='pre-render a map per crime type')
+    build.add_argument('--severities', action='store_true', help='pre-render a map per severity')
+    build.add_argument('--output', help=f'artifact root directory (default: {ARTIFACT_DIR})')
+    build.add_argument('--keep-old', action='store_true', help='keep artifacts built from other data')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    directory, meta = build_artifacts(args.csv_file, _filter_sets(args), args.output, args.keep_old)
+    print(f"Wrote {len(meta['maps'])} maps for {meta['rows']} rows to {directory} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
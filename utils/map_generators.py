@@ -1,12 +1,224 @@
+import numpy as np
 import pandas as pd
 import folium
 from folium import plugins
 import json
+import re
+import zlib
+from urllib.parse import urlencode
 
-def generate_map(csv_file):
-    """Generate the main interactive map"""
+from utils.data_store import load_dataset
+from utils.map_layers import IncidentMarkerCluster, IncidentHeatMap
+from utils.spatial_index import spatial_index
+from utils.filter_index import filter_index, intersect_sorted
+from utils.gazetteer import gazetteer
+from utils.neighborhoods import neighborhood_assignment
+from utils.heat_grid import heat_grid, heat_level
+from utils.hotspots import (
+    detect_hotspots, hotspot_cache, DEFAULT_CELL_KM, DEFAULT_MIN_INCIDENTS, DEFAULT_MIN_Z
+)
+from utils.clustering import severity_codes, cluster_hierarchy, ClusterHierarchy
+from utils.route_risk import risk_raster, RISK_WEIGHT
+from utils.metrics import stage
+from utils.stats_engine import crime_statistics, CrimeStatistics
+from utils.time_cube import time_cube
+
+# Rows serialised per chunk when streaming exports
+EXPORT_CHUNK_ROWS = 10000
+# Endpoint the heat layer fetches density cells from as the map moves
+HEAT_URL = '/api/heat'
+LOCATION_DETAILS_URL = '/api/location_details/'
+# "lat,lng" as accepted for route endpoints
+COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+# Hotspots drawn on the main map's (initially hidden) hotspot layer
+HOTSPOT_LAYER_LIMIT = 20
+
+def _text_column(df, column, default, lower=False):
+    """Return a column as a list of strings, substituting ``default`` for missing values"""
+    if column not in df.columns:
+        return [default] * len(df)
+    values = df[column].str.lower() if lower else df[column].astype(object)
+    return values.where(values.notna(), default).tolist()
+
+def _dictionary_column(df, column, default, format_value=str):
+    """Return a column as {'values': distinct strings, 'codes': index into values per row}"""
+    if column not in df.columns:
+        return {'values': [default], 'codes': [0] * len(df)}
+    # Only the distinct values are formatted, not every row
+    codes, uniques = pd.factorize(df[column])
+    values = [format_value(value) for value in uniques]
+    if (codes < 0).any():
+        codes = np.where(codes < 0, len(values), codes)
+        values.append(default)
+    return {'values': values, 'codes': codes.tolist()}
+
+def _incident_columns(df, compact=False):
+    """Build the columnar marker payload for every incident with coordinates.
+    
+    With ``compact``, text columns are dictionary-encoded ({'values', 'codes'})
+    and incident ids are included, so repeated strings are sent once.
+    """
+    df = df[df['latitude'].notna() & df['longitude'].notna()]
+    columns = {
+        'lat': df['latitude'].to_numpy(dtype='float64').round(5).tolist(),
+        'lng': df['longitude'].to_numpy(dtype='float64').round(5).tolist()
+    }
+    
+    if compact:
+        columns['id'] = (df['id'] if 'id' in df.columns else df.index.to_series()).fillna(-1).astype('int64').tolist()
+        columns.update({
+            'location': _dictionary_column(df, 'location_description', 'Unknown Location'),
+            'crime_type': _dictionary_column(df, 'crime_type', 'Unknown Crime'),
+            'severity': _dictionary_column(df, 'severity', 'medium', lambda value: str(value).lower()),
+            'date': _dictionary_column(df, 'date', 'Unknown Date', lambda value: value.strftime('%Y-%m-%d'))
+        })
+        return columns
+    
+    if 'date' in df.columns:
+        dates = df['date'].dt.strftime('%Y-%m-%d')
+        dates = dates.where(dates.notna(), 'Unknown Date').tolist()
+    else:
+        dates = ['Unknown Date'] * len(df)
+    
+    columns.update({
+        'location': _text_column(df, 'location_description', 'Unknown Location'),
+        'crime_type': _text_column(df, 'crime_type', 'Unknown Crime'),
+        'severity': _text_column(df, 'severity', 'medium', lower=True),
+        'date': dates
+    })
+    return columns
+
+def _add_incident_layers(m, df, heat_map_name, heat_points, heat_query=''):
+    """Add the incident marker cluster and heat map to ``m`` without per-row folium objects.
+    
+    The heat map gets density cells (lat, lng, weight) rather than every incident.
+    """
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        return
+    
+    IncidentMarkerCluster(_incident_columns(df, compact=True), details_url=LOCATION_DETAILS_URL).add_to(m)
+    
+    # Added even when empty so the page can fill it in later via setHeatFilters
+    IncidentHeatMap(heat_points, name=heat_map_name, url=HEAT_URL, query=heat_query).add_to(m)
+
+def _heat_query(location_filter='', crime_type_filter='', severity_filter='', neighborhood_filter='',
+                date_from=None, date_to=None, days=None):
+    """The filters as the query string the heat layer adds to its requests"""
+    filters = {
+        'location': location_filter,
+        'crime_type': crime_type_filter,
+        'severity': severity_filter,
+        'neighborhood': neighborhood_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+        'days': days
+    }
+    return urlencode({key: value for key, value in filters.items() if value})
+
+def heat_points(csv_file, zoom, bbox=None, location_filter='', crime_type_filter='', severity_filter='',
+                neighborhood_filter='', weighted=True, smooth=True, date_from=None, date_to=None, days=None):
+    """Return severity-weighted density cells (lat, lng, weight) for a zoom level and optional bounding box"""
+    data = load_dataset(csv_file)
+    rows = filter_rows(data, location_filter, crime_type_filter, severity_filter, neighborhood_filter,
+                       date_from, date_to, days)
+    if rows is None:
+        level = heat_grid(data).level(zoom)
+    else:
+        level = heat_level(data.df.iloc[rows], zoom)
+    return level.points(*(bbox or ()), weighted=weighted, smooth=smooth)
+
+def incident_clusters(csv_file, west, south, east, north, zoom, limit=None, date_from=None, date_to=None, days=None):
+    """Return the incident clusters in a bounding box at a zoom level and their incident total, optionally for a date range only"""
+    data = load_dataset(csv_file)
+    rows = filter_rows(data, date_from=date_from, date_to=date_to, days=days)
+    if rows is None:
+        hierarchy = cluster_hierarchy(data)
+    else:
+        hierarchy = ClusterHierarchy.from_frame(data.df.iloc[rows])
+    return hierarchy.query(west, south, east, north, zoom, limit=limit)
+
+def filter_rows(data, location_filter='', crime_type_filter='', severity_filter='', neighborhood_filter='',
+                date_from=None, date_to=None, days=None):
+    """Return sorted row ids of a dataset snapshot matching the filters, or None when no filter applies.
+    
+    ``date_from``/``date_to`` (YYYY-MM-DD, inclusive) or ``days`` (the last N days up to the latest
+    incident) restrict the dates; an unparseable date raises ValueError.
+    """
+    rows = filter_index(data).filter_rows(location_filter, crime_type_filter, severity_filter, date_from, date_to, days)
+    if neighborhood_filter and neighborhood_filter.lower() != 'all':
+        in_neighborhood = neighborhood_assignment(data).rows_for(neighborhood_filter)
+        rows = in_neighborhood if rows is None else intersect_sorted(rows, in_neighborhood)
+    return rows
+
+def filter_incidents(data, location_filter='', crime_type_filter='', severity_filter='', neighborhood_filter='',
+                     date_from=None, date_to=None, days=None):
+    """Return the rows of a dataset snapshot matching the location, crime type, severity, neighborhood and date filters"""
+    rows = filter_rows(data, location_filter, crime_type_filter, severity_filter, neighborhood_filter,
+                       date_from, date_to, days)
+    return data.df if rows is None else data.df.iloc[rows]
+
+def find_hotspots(csv_file, crime_type_filter='', severity_filter='', date_from=None, date_to=None,
+                  cell_km=DEFAULT_CELL_KM, min_incidents=DEFAULT_MIN_INCIDENTS, min_z=DEFAULT_MIN_Z, limit=None,
+                  days=None):
+    """Return ranked incident hotspots for the filters, cached per dataset version and parameters"""
+    data = load_dataset(csv_file)
+    key = (data.path, crime_type_filter or '', severity_filter or '', date_from or '', date_to or '', days or 0,
+           float(cell_km), int(min_incidents), float(min_z), limit)
+    hotspots = hotspot_cache.get(data.version, key)
+    if hotspots is not None:
+        return hotspots
+    
+    with stage('find_hotspots', 'filter'):
+        rows = filter_rows(data, '', crime_type_filter, severity_filter, '', date_from, date_to, days)
+        df = data.df if rows is None else data.df.iloc[rows]
+    with stage('find_hotspots', 'detect'):
+        hotspots = detect_hotspots(df['latitude'].to_numpy(dtype='float64', na_value=np.nan),
+                                   df['longitude'].to_numpy(dtype='float64', na_value=np.nan),
+                                   severity_codes(df), cell_km, min_incidents, min_z, limit)
+    hotspot_cache.put(data.version, key, hotspots, size=len(json.dumps(hotspots)))
+    return hotspots
+
+def _add_hotspot_layer(m, hotspots):
+    """Add the hotspots as outlined areas on a layer that starts switched off"""
+    layer = folium.FeatureGroup(name='Hotspots', show=False)
+    for hotspot in hotspots:
+        west, south, east, north = hotspot['bounds']
+        folium.Rectangle(
+            bounds=[[south, west], [north, east]],
+            color='purple',
+            weight=2,
+            fill=True,
+            fill_opacity=0.15,
+            tooltip=f"Hotspot #{hotspot['rank']}: {hotspot['count']} incidents (z = {hotspot['z_score']})"
+        ).add_to(layer)
+    layer.add_to(m)
+
+def _add_neighborhood_layer(m, data):
+    """Add a choropleth of incident counts per neighborhood, if any neighborhoods are defined"""
+    assignment = neighborhood_assignment(data)
+    if not len(assignment.index):
+        return
+    counts = assignment.counts()
+    choropleth = folium.Choropleth(
+        geo_data=assignment.index.geojson(counts),
+        data=pd.DataFrame({'neighborhood_id': range(len(counts)), 'incidents': counts}),
+        columns=['neighborhood_id', 'incidents'],
+        key_on='feature.properties.neighborhood_id',
+        fill_color='YlOrRd',
+        fill_opacity=0.5,
+        line_opacity=0.4,
+        legend_name='Incidents per neighborhood',
+        name='Neighborhoods'
+    )
+    choropleth.geojson.add_child(folium.GeoJsonTooltip(['name', 'incidents'], aliases=['Neighborhood', 'Incidents']))
+    choropleth.add_to(m)
+
+def generate_map(csv_file, choropleth=True):
+    """Generate the main interactive map, with a neighborhood choropleth layer unless ``choropleth`` is False"""
     try:
-        df = pd.read_csv(csv_file)
+        with stage('generate_map', 'load'):
+            data = load_dataset(csv_file)
+        df = data.df
         
         # Center the map on Andhra Pradesh
         center_lat = 15.9129
@@ -23,64 +235,15 @@ def generate_map(csv_file):
         folium.TileLayer('CartoDB positron').add_to(m)
         folium.TileLayer('CartoDB dark_matter').add_to(m)
         
-        # Create marker clusters for better performance
-        marker_cluster = plugins.MarkerCluster().add_to(m)
-        
-        # Define colors for different severity levels
-        colors = {
-            'low': 'green',
-            'medium': 'orange', 
-            'high': 'red'
-        }
-        
-        # Add markers for each crime location
-        for index, row in df.iterrows():
-            # Get coordinates (adjust column names as per your CSV)
-            lat = row.get('latitude', None)
-            lng = row.get('longitude', None)
-            
-            # If no coordinates, skip or use geocoding service
-            if pd.isna(lat) or pd.isna(lng):
-                continue
-                
-            location_name = row.get('location_description', 'Unknown Location')
-            crime_type = row.get('crime_type', 'Unknown Crime')
-            severity = row.get('severity', 'medium').lower()
-            date = row.get('date', 'Unknown Date')
+        # Add clustered markers and the heat map from columnar incident data
+        with stage('generate_map', 'layers'):
+            _add_incident_layers(m, df, 'Crime Heat Map', heat_grid(data).level(7).points(smooth=True))
             
-            # Create popup content with navigation button
-            popup_content = f"""
-            <div style="width: 250px;">
-                <h5>{location_name}</h5>
-                <p><strong>Crime Type:</strong> {crime_type}</p>
-                <p><strong>Severity:</strong> {severity.title()}</p>
-                <p><strong>Date:</strong> {date}</p>
-                <button onclick="parent.onMarkerClick('{location_name}', '{location_name}, Andhra Pradesh, India')" 
-                        class="btn btn-sm btn-primary">
-                    📍 Select for Navigation
-                </button>
-            </div>
-            """
+            # Add incident counts per neighborhood from the precomputed assignment
+            if choropleth:
+                _add_neighborhood_layer(m, data)
             
-            # Add marker to cluster
-            folium.Marker(
-                [lat, lng],
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=f"{location_name} - {crime_type}",
-                icon=folium.Icon(
-                    color=colors.get(severity, 'blue'),
-                    icon='exclamation-triangle',
-                    prefix='fa'
-                )
-            ).add_to(marker_cluster)
-        
-        # Add heat map layer
-        if 'latitude' in df.columns and 'longitude' in df.columns:
-            heat_data = [[row['latitude'], row['longitude']] for idx, row in df.iterrows() 
-                        if pd.notna(row['latitude']) and pd.notna(row['longitude'])]
-            
-            if heat_data:
-                plugins.HeatMap(heat_data, name='Crime Heat Map').add_to(m)
+            _add_hotspot_layer(m, find_hotspots(csv_file, limit=HOTSPOT_LAYER_LIMIT))
         
         # Add layer control
         folium.LayerControl().add_to(m)
@@ -91,26 +254,24 @@ def generate_map(csv_file):
         # Add measure control
         plugins.MeasureControl().add_to(m)
         
-        return m._repr_html_()
+        with stage('generate_map', 'serialize'):
+            return m._repr_html_()
         
     except Exception as e:
         print(f"Error generating map: {e}")
         return f"<div class='alert alert-danger'>Error loading map: {str(e)}</div>"
 
-def generate_filtered_map(csv_file, location_filter='', crime_type_filter='', severity_filter=''):
+def generate_filtered_map(csv_file, location_filter='', crime_type_filter='', severity_filter='', neighborhood_filter='',
+                          date_from=None, date_to=None, days=None):
     """Generate filtered map based on user inputs"""
     try:
-        df = pd.read_csv(csv_file)
+        with stage('generate_filtered_map', 'load'):
+            data = load_dataset(csv_file)
         
         # Apply filters
-        if location_filter and location_filter.lower() != 'all':
-            df = df[df['location_description'].str.contains(location_filter, case=False, na=False)]
-        
-        if crime_type_filter and crime_type_filter != 'All':
-            df = df[df['crime_type'] == crime_type_filter]
-            
-        if severity_filter and severity_filter != 'All':
-            df = df[df['severity'].str.lower() == severity_filter.lower()]
+        with stage('generate_filtered_map', 'filter'):
+            df = filter_incidents(data, location_filter, crime_type_filter, severity_filter, neighborhood_filter,
+                                  date_from, date_to, days)
         
         # If filtered data is empty, return message
         if df.empty:
@@ -135,61 +296,13 @@ def generate_filtered_map(csv_file, location_filter='', crime_type_filter='', se
         folium.TileLayer('CartoDB positron').add_to(m)
         folium.TileLayer('CartoDB dark_matter').add_to(m)
         
-        # Create marker clusters
-        marker_cluster = plugins.MarkerCluster().add_to(m)
-        
-        # Define colors for different severity levels
-        colors = {
-            'low': 'green',
-            'medium': 'orange',
-            'high': 'red'
-        }
-        
-        # Add markers for filtered results
-        for index, row in df.iterrows():
-            lat = row.get('latitude', None)
-            lng = row.get('longitude', None)
-            
-            if pd.isna(lat) or pd.isna(lng):
-                continue
-                
-            location_name = row.get('location_description', 'Unknown Location')
-            crime_type = row.get('crime_type', 'Unknown Crime')
-            severity = row.get('severity', 'medium').lower()
-            date = row.get('date', 'Unknown Date')
-            
-            # Create popup content with navigation button
-            popup_content = f"""
-            <div style="width: 250px;">
-                <h5>{location_name}</h5>
-                <p><strong>Crime Type:</strong> {crime_type}</p>
-                <p><strong>Severity:</strong> {severity.title()}</p>
-                <p><strong>Date:</strong> {date}</p>
-                <button onclick="parent.onMarkerClick('{location_name}', '{location_name}, Andhra Pradesh, India')" 
-                        class="btn btn-sm btn-primary">
-                    📍 Select for Navigation
-                </button>
-            </div>
-            """
-            
-            folium.Marker(
-                [lat, lng],
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=f"{location_name} - {crime_type}",
-                icon=folium.Icon(
-                    color=colors.get(severity, 'blue'),
-                    icon='exclamation-triangle',
-                    prefix='fa'
-                )
-            ).add_to(marker_cluster)
-        
-        # Add heat map for filtered data
-        if len(df) > 0 and 'latitude' in df.columns and 'longitude' in df.columns:
-            heat_data = [[row['latitude'], row['longitude']] for idx, row in df.iterrows() 
-                        if pd.notna(row['latitude']) and pd.notna(row['longitude'])]
-            
-            if heat_data:
-                plugins.HeatMap(heat_data, name='Filtered Crime Heat Map').add_to(m)
+        # Add clustered markers and heat map for filtered results
+        with stage('generate_filtered_map', 'layers'):
+            _add_incident_layers(
+                m, df, 'Filtered Crime Heat Map', heat_level(df, 9).points(smooth=True),
+                _heat_query(location_filter, crime_type_filter, severity_filter, neighborhood_filter,
+                            date_from, date_to, days)
+            )
         
         # Add layer control
         folium.LayerControl().add_to(m)
@@ -197,16 +310,53 @@ def generate_filtered_map(csv_file, location_filter='', crime_type_filter='', se
         # Add fullscreen button
         plugins.Fullscreen().add_to(m)
         
-        return m._repr_html_()
+        with stage('generate_filtered_map', 'serialize'):
+            return m._repr_html_()
         
     except Exception as e:
         print(f"Error generating filtered map: {e}")
         return f"<div class='alert alert-danger'>Error loading filtered map: {str(e)}</div>"
 
+def generate_incident_data(csv_file, location_filter='', crime_type_filter='', severity_filter='', output_format='columns',
+                           neighborhood_filter='', date_from=None, date_to=None, days=None):
+    """Return the filtered incidents as columnar data (plain or dictionary-encoded) or a GeoJSON FeatureCollection"""
+    return incident_data(load_dataset(csv_file), location_filter, crime_type_filter, severity_filter, output_format,
+                         neighborhood_filter, date_from, date_to, days)
+
+def incident_data(data, location_filter='', crime_type_filter='', severity_filter='', output_format='columns',
+                  neighborhood_filter='', date_from=None, date_to=None, days=None):
+    """Like ``generate_incident_data``, for a dataset snapshot that is already loaded"""
+    with stage('generate_incident_data', 'filter'):
+        df = filter_incidents(data, location_filter, crime_type_filter, severity_filter,
+                              neighborhood_filter, date_from, date_to, days)
+    with stage('generate_incident_data', 'columns'):
+        columns = _incident_columns(df, compact=(output_format == 'compact'))
+    
+    if output_format != 'geojson':
+        return {'count': len(columns['lat']), 'columns': columns}
+    
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+            'properties': {
+                'location': location,
+                'crime_type': crime_type,
+                'severity': severity,
+                'date': date
+            }
+        }
+        for lat, lng, location, crime_type, severity, date in zip(
+            columns['lat'], columns['lng'], columns['location'],
+            columns['crime_type'], columns['severity'], columns['date']
+        )
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
 def get_unique_values(csv_file):
     """Get unique values for filter dropdowns"""
     try:
-        df = pd.read_csv(csv_file)
+        df = load_dataset(csv_file).df
         
         locations = sorted(df['location_description'].dropna().unique().tolist())
         crime_types = sorted(df['crime_type'].dropna().unique().tolist())
@@ -225,41 +375,15 @@ def get_unique_values(csv_file):
             'severities': []
         }
 
-def generate_statistics(csv_file):
-    """Generate crime statistics"""
+def generate_statistics(csv_file, date_from=None, date_to=None, days=None):
+    """Generate crime statistics, optionally for a date range only"""
     try:
-        df = pd.read_csv(csv_file)
-        
-        # Basic statistics
-        total_crimes = len(df)
-        
-        # Crime type distribution
-        crime_by_type = df['crime_type'].value_counts().to_dict()
-        
-        # Severity distribution
-        severity_counts = df['severity'].value_counts().to_dict()
-        
-        # Location with most crimes
-        location_counts = df['location_description'].value_counts()
-        top_location = location_counts.index[0] if not location_counts.empty else "N/A"
-        top_location_count = location_counts.iloc[0] if not location_counts.empty else 0
-        
-        # Recent crimes (assuming date column exists)
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            recent_crimes = df.sort_values('date', ascending=False).head(5)
-            recent_crimes_list = recent_crimes[['location_description', 'crime_type', 'severity', 'date']].to_dict('records')
-        else:
-            recent_crimes_list = []
-        
-        return {
-            'total_crimes': total_crimes,
-            'crime_by_type': crime_by_type,
-            'severity_counts': severity_counts,
-            'top_location': top_location,
-            'top_location_count': top_location_count,
-            'recent_crimes': recent_crimes_list
-        }
+        data = load_dataset(csv_file)
+        rows = filter_rows(data, date_from=date_from, date_to=date_to, days=days)
+        if rows is not None:
+            return CrimeStatistics(data.df.iloc[rows]).summary()
+        # Aggregates are maintained by the dataset store, not recomputed per call
+        return crime_statistics(data).summary()
         
     except Exception as e:
         print(f"Error generating statistics: {e}")
@@ -268,63 +392,64 @@ def generate_statistics(csv_file):
             'crime_by_type': {},
             'severity_counts': {},
             'top_location': "N/A",
+            'location_counts': {},
             'top_location_count': 0,
             'recent_crimes': []
         }
 
-def generate_route_map(start_location, end_location):
-    """Generate a route map between two locations"""
-    try:
-        # Create base map centered between locations
-        m = folium.Map(
-            location=[15.9129, 79.7400],  # Default to AP center
-            zoom_start=10,
-            tiles='OpenStreetMap'
-        )
-        
-        # Add start marker
-        folium.Marker(
-            [15.9129, 79.7400],  # You would need to geocode the actual coordinates
-            popup=f"Start: {start_location}",
-            tooltip="Starting Point",
-            icon=folium.Icon(color='green', icon='play', prefix='fa')
-        ).add_to(m)
-        
-        # Add end marker
-        folium.Marker(
-            [15.9129, 79.7400],  # You would need to geocode the actual coordinates
-            popup=f"Destination: {end_location}",
-            tooltip="Destination",
-            icon=folium.Icon(color='red', icon='stop', prefix='fa')
-        ).add_to(m)
-        
-        # Note: For actual routing, you would need to integrate with a routing service
-        # like OpenRouteService, GraphHopper, or Google Directions API
-        
-        return m._repr_html_()
-        
-    except Exception as e:
-        print(f"Error generating route map: {e}")
-        return f"<div class='alert alert-danger'>Error generating route: {str(e)}</div>"
+def iter_export_chunks(df, output_format='csv', rows=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield ``df`` (or only its row positions ``rows``) as CSV or NDJSON text, a chunk at a time"""
+    total = len(df) if rows is None else len(rows)
+    for start in range(0, max(total, 1), chunk_rows):
+        if rows is None:
+            chunk = df.iloc[start:start + chunk_rows]
+        else:
+            chunk = df.iloc[rows[start:start + chunk_rows]]
+        
+        # Plain dates and coordinates rather than timestamps and float32 noise
+        if 'date' in chunk.columns:
+            chunk = chunk.assign(date=chunk['date'].dt.strftime('%Y-%m-%d'))
+        for column in ('latitude', 'longitude'):
+            if column in chunk.columns:
+                chunk = chunk.assign(**{column: chunk[column].astype('float64').round(5)})
+        
+        if output_format == 'ndjson':
+            if len(chunk):
+                text = chunk.to_json(orient='records', lines=True)
+                yield text if text.endswith('\n') else text + '\n'
+        else:
+            yield chunk.to_csv(index=False, header=(start == 0))
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a gzip byte stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for text in chunks:
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
 
-def export_filtered_data(csv_file, location_filter='', crime_type_filter='', severity_filter=''):
+def stream_filtered_data(csv_file, location_filter='', crime_type_filter='', severity_filter='', output_format='csv',
+                         neighborhood_filter='', date_from=None, date_to=None, days=None):
+    """Yield the filtered incidents as CSV or NDJSON text chunks without materialising the result"""
+    data = load_dataset(csv_file)
+    rows = filter_rows(data, location_filter, crime_type_filter, severity_filter, neighborhood_filter,
+                       date_from, date_to, days)
+    return iter_export_chunks(data.df, output_format, rows)
+
+def export_filtered_data(csv_file, location_filter='', crime_type_filter='', severity_filter='', date_from=None,
+                         date_to=None, days=None):
     """Export filtered crime data to CSV"""
     try:
-        df = pd.read_csv(csv_file)
-        
         # Apply filters
-        if location_filter and location_filter.lower() != 'all':
-            df = df[df['location_description'].str.contains(location_filter, case=False, na=False)]
+        df = filter_incidents(load_dataset(csv_file), location_filter, crime_type_filter, severity_filter, '',
+                              date_from, date_to, days)
         
-        if crime_type_filter and crime_type_filter != 'All':
-            df = df[df['crime_type'] == crime_type_filter]
-            
-        if severity_filter and severity_filter != 'All':
-            df = df[df['severity'].str.lower() == severity_filter.lower()]
-        
-        # Export to CSV
+        # Export to CSV, a chunk of rows at a time
         output_filename = f"filtered_crimes_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        df.to_csv(output_filename, index=False)
+        with open(output_filename, 'w', newline='') as f:
+            for text in iter_export_chunks(df):
+                f.write(text)
         
         return {
             'success': True,
@@ -340,27 +465,78 @@ def export_filtered_data(csv_file, location_filter='', crime_type_filter='', sev
             'count': 0
         }
 
+def find_nearby_incidents(csv_file, lat, lng, radius_km=10, k=None, date_from=None, date_to=None, days=None):
+    """Find incidents within radius_km of a point (or its k nearest), nearest first, optionally in a date range"""
+    data = load_dataset(csv_file)
+    index = spatial_index(data)
+    dated = filter_rows(data, date_from=date_from, date_to=date_to, days=days)
+    keep = None
+    if dated is not None:
+        keep = np.zeros(len(data.df), dtype=bool)
+        keep[dated] = True
+    
+    if k:
+        rows, distances = index.query_nearest(lat, lng, k, max_radius_km=radius_km, keep=keep)
+    else:
+        rows, distances = index.query_radius(lat, lng, radius_km, keep)
+    
+    return data.df.iloc[rows].assign(distance_km=distances.round(3))
+
+def incident_records(df):
+    """Convert incident rows to JSON-friendly dicts"""
+    columns = [column for column in ['location_description', 'crime_type', 'severity', 'date',
+                                     'latitude', 'longitude', 'distance_km'] if column in df.columns]
+    records = df[columns].astype(object)
+    
+    if 'date' in columns:
+        records['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    for column in ['latitude', 'longitude']:
+        if column in columns:
+            records[column] = df[column].to_numpy(dtype='float64').round(5)
+    
+    return records.where(records.notna(), None).to_dict('records')
+
 def search_crimes_near_location(csv_file, location, radius_km=5):
     """Search for crimes near a specific location within a given radius"""
     try:
-        df = pd.read_csv(csv_file)
+        data = load_dataset(csv_file)
         
-        # For demonstration, using simple text matching
-        # In production, you would use geospatial queries with proper coordinates
-        nearby_crimes = df[df['location_description'].str.contains(location, case=False, na=False)]
+        # Use the location's own centroid, or the centre of all partially matching locations
+        details = gazetteer(data).details(location)
+        if details is not None and details['latitude'] is not None:
+            center_lat, center_lng = details['latitude'], details['longitude']
+        else:
+            df = data.df
+            matches = df[df['location_description'].str.contains(location, case=False, na=False, regex=False)]
+            matches = matches.dropna(subset=['latitude', 'longitude'])
+            
+            if matches.empty:
+                return {
+                    'success': False,
+                    'message': f"Location {location} not found",
+                    'count': 0,
+                    'crimes': []
+                }
+            
+            center_lat = round(float(matches['latitude'].mean()), 5)
+            center_lng = round(float(matches['longitude'].mean()), 5)
+        nearby_crimes = find_nearby_incidents(csv_file, center_lat, center_lng, radius_km)
         
         if nearby_crimes.empty:
             return {
                 'success': False,
                 'message': f"No crimes found near {location}",
+                'count': 0,
                 'crimes': []
             }
         
-        crimes_list = nearby_crimes[['location_description', 'crime_type', 'severity', 'date']].to_dict('records')
+        crimes_list = incident_records(nearby_crimes)
         
         return {
             'success': True,
-            'message': f"Found {len(crimes_list)} crimes near {location}",
+            'message': f"Found {len(crimes_list)} crimes within {radius_km} km of {location}",
+            'count': len(crimes_list),
+            'center': {'latitude': center_lat, 'longitude': center_lng},
             'crimes': crimes_list
         }
         
@@ -369,37 +545,34 @@ def search_crimes_near_location(csv_file, location, radius_km=5):
         return {
             'success': False,
             'message': f"Error searching: {str(e)}",
+            'count': 0,
             'crimes': []
         }
 
 def generate_crime_trend_data(csv_file):
     """Generate data for crime trend analysis"""
     try:
-        df = pd.read_csv(csv_file)
+        data = load_dataset(csv_file)
         
-        if 'date' not in df.columns:
+        if 'date' not in data.df.columns:
             return {'error': 'Date column not found in data'}
         
-        # Convert date column
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df = df.dropna(subset=['date'])
-        
-        # Group by month and crime type
-        df['month_year'] = df['date'].dt.to_period('M')
-        trend_data = df.groupby(['month_year', 'crime_type']).size().unstack(fill_value=0)
+        # Monthly counts per crime type, sliced from the precomputed time cube
+        trends = time_cube(data).rollup('month', 'crime_type')
+        months = [i for i, count in enumerate(trends['total']) if count]
         
         # Convert to format suitable for visualization
         trend_dict = {}
-        for crime_type in trend_data.columns:
+        for crime_type, counts in trends['series'].items():
             trend_dict[crime_type] = [
-                {'month': str(month), 'count': count} 
-                for month, count in trend_data[crime_type].items()
+                {'month': trends['buckets'][i], 'count': counts[i]}
+                for i in months
             ]
         
         return {
             'success': True,
             'trend_data': trend_dict,
-            'total_months': len(trend_data.index)
+            'total_months': len(months)
         }
         
     except Exception as e:
@@ -408,42 +581,69 @@ def generate_crime_trend_data(csv_file):
     
     
     
-def generate_route_map(start_location, end_location, user_lat=None, user_lng=None):
-    """Generate a route map from user's current location to destination"""
+def resolve_place(data, place):
+    """Return (lat, lng) for a "lat,lng" string or a known location name, or None"""
+    if isinstance(place, (tuple, list)):
+        return float(place[0]), float(place[1])
+    match = COORDINATES.match(place or '')
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    details = gazetteer(data).details(place)
+    if details is None or details['latitude'] is None:
+        return None
+    return details['latitude'], details['longitude']
+
+def route_risk(csv_file, start, end, risk_weight=RISK_WEIGHT):
+    """Return the lowest-risk route between two places ("lat,lng" or location names) over the incident risk raster"""
+    data = load_dataset(csv_file)
+    start_point, end_point = resolve_place(data, start), resolve_place(data, end)
+    if start_point is None or end_point is None:
+        missing = start if start_point is None else end
+        raise ValueError(f"Location {missing} not found")
+    with stage('route_risk', 'search'):
+        route = risk_raster(data).route(start_point, end_point, risk_weight)
+    route.update(start=list(start_point), end=list(end_point))
+    return route
+
+def generate_route_map(csv_file, start_location, end_location, user_lat=None, user_lng=None, risk_weight=RISK_WEIGHT):
+    """Generate a map of the lowest-risk route to a destination, from the user's location when given"""
     try:
-        # Use user's current location if provided, otherwise use default
-        if user_lat and user_lng:
-            start_coords = [user_lat, user_lng]
-            start_label = "Your Location"
-        else:
-            # Fallback to default location if user location not available
-            start_coords = [15.9129, 79.7400]
-            start_label = start_location
+        start = (user_lat, user_lng) if user_lat is not None and user_lng is not None else start_location
+        route = route_risk(csv_file, start, end_location, risk_weight)
+        start_label = "Your Location" if isinstance(start, tuple) else start_location
+        
+        m = folium.Map(location=route['start'], zoom_start=10, tiles='OpenStreetMap')
+        
+        folium.PolyLine(
+            [route['start'], route['end']],
+            color='gray',
+            weight=3,
+            dash_array='6 8',
+            tooltip=f"Direct line: {route['direct_distance_km']} km, risk {route['direct_risk_score']:.2f}"
+        ).add_to(m)
         
-        # Create base map centered on start location
-        m = folium.Map(
-            location=start_coords,
-            zoom_start=10,
-            tiles='OpenStreetMap'
-        )
+        folium.PolyLine(
+            route['path'],
+            color='blue',
+            weight=5,
+            tooltip=f"Lowest-risk route: {route['distance_km']} km, risk {route['risk_score']:.2f}"
+        ).add_to(m)
         
-        # Add current location marker
         folium.Marker(
-            start_coords,
+            route['start'],
             popup=f"Start: {start_label}",
-            tooltip="Starting Point (Your Location)",
+            tooltip="Starting Point",
             icon=folium.Icon(color='green', icon='play', prefix='fa')
         ).add_to(m)
         
-        # Add destination marker (you'll need to geocode the end_location)
-        # For now using default coords - replace with actual geocoded coordinates
         folium.Marker(
-            [15.9129, 79.7400],  # Replace with geocoded coordinates of end_location
+            route['end'],
             popup=f"Destination: {end_location}",
             tooltip="Destination",
             icon=folium.Icon(color='red', icon='stop', prefix='fa')
         ).add_to(m)
         
+        m.fit_bounds([route['start'], route['end']] + route['path'])
         return m._repr_html_()
         
     except Exception as e:
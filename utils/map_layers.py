@@ -0,0 +1,210 @@
+import json
+
+from folium import plugins
+from folium.utilities import camelize
+from jinja2 import Template
+
+
+# Characters that could end the inline <script> (or the srcdoc attribute) the JSON is written into
+_SCRIPT_UNSAFE = str.maketrans({
+    '<': '\\u003c', '>': '\\u003e', '&': '\\u0026', "'": '\\u0027',
+    '\u2028': '\\u2028', '\u2029': '\\u2029'
+})
+
+
+def _compact_json(value):
+    """JSON for a script literal, with the HTML-significant characters escaped since the data is user input"""
+    return json.dumps(value, separators=(',', ':')).translate(_SCRIPT_UNSAFE)
+
+
+def _leaflet_options(options):
+    """Return plugin options with camelCase keys, as Leaflet expects them"""
+    return {camelize(key): value for key, value in options.items()}
+
+
+class IncidentMarkerCluster(plugins.MarkerCluster):
+    """Marker cluster whose markers are created in the browser from columnar data.
+
+    ``columns`` is a dict of equal-length lists (``lat``, ``lng``, ``location``,
+    ``crime_type``, ``severity``, ``date`` and optionally ``id``). Text columns
+    may be dictionary-encoded as ``{'values': [...], 'codes': [...]}``. It is
+    serialised once as a single JSON blob instead of emitting one folium
+    Marker, Icon and Popup per incident.
+
+    Popups and tooltips are rendered from one template when a marker is
+    opened. With ``details_url``, an open popup also shows how many incidents
+    were reported at its location, fetched from ``details_url + location``.
+
+    The rendered map also defines ``window.setIncidentData(columns, fitBounds)``
+    so the page can swap in new columns (from ``/api/incidents``) in place.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function() {
+                var map = {{ this._parent.get_name() }};
+                var colors = {low: 'green', medium: 'orange', high: 'red'};
+                var detailsUrl = {{ this.details_url|tojson }};
+                var locationCounts = {};
+                var escape = function(text) {
+                    return String(text).replace(/&/g, '&amp;').replace(/</g, '&lt;')
+                        .replace(/>/g, '&gt;').replace(/"/g, '&quot;').replace(/'/g, '&#39;');
+                };
+                // Text columns are plain lists or dictionary-encoded {values, codes}
+                var text = function(column, i) {
+                    return column.codes ? column.values[column.codes[i]] : column[i];
+                };
+                var showLocationCount = function(element, location) {
+                    var show = function(count) {
+                        element.textContent = count === undefined ? '' : count + ' incidents reported here';
+                    };
+                    if (location in locationCounts) {
+                        return show(locationCounts[location]);
+                    }
+                    fetch(detailsUrl + encodeURIComponent(location))
+                        .then(function(response) { return response.json(); })
+                        .then(function(details) {
+                            locationCounts[location] = details.crime_count;
+                            show(details.crime_count);
+                        })
+                        .catch(function() {});
+                };
+                var buildMarkers = function(cols) {
+                    var popup = function(marker) {
+                        var i = marker.incidentIndex;
+                        var location = text(cols.location, i);
+                        var name = escape(location);
+                        var severity = text(cols.severity, i);
+                        var element = document.createElement('div');
+                        element.style.width = '250px';
+                        element.innerHTML =
+                            '<h5>' + name + '</h5>' +
+                            (cols.id ? '<p class="text-muted">Incident #' + cols.id[i] + '</p>' : '') +
+                            '<p><strong>Crime Type:</strong> ' + escape(text(cols.crime_type, i)) + '</p>' +
+                            '<p><strong>Severity:</strong> ' + escape(severity.charAt(0).toUpperCase() + severity.slice(1)) + '</p>' +
+                            '<p><strong>Date:</strong> ' + escape(text(cols.date, i)) + '</p>' +
+                            '<p class="location-count text-muted"></p>';
+                        // Location names come from ingested data, so they never go into markup or handler code
+                        var button = document.createElement('button');
+                        button.className = 'btn btn-sm btn-primary';
+                        button.textContent = '📍 Select for Navigation';
+                        button.addEventListener('click', function() {
+                            parent.onMarkerClick(location, location + ', Andhra Pradesh, India');
+                        });
+                        element.appendChild(button);
+                        if (detailsUrl) {
+                            showLocationCount(element.querySelector('.location-count'), location);
+                        }
+                        return element;
+                    };
+                    var tooltip = function(marker) {
+                        var i = marker.incidentIndex;
+                        return escape(text(cols.location, i) + ' - ' + text(cols.crime_type, i));
+                    };
+                    // Icons only create DOM nodes when shown, so one per severity is shared by all markers
+                    var icons = {};
+                    var markers = new Array(cols.lat.length);
+                    for (var i = 0; i < cols.lat.length; i++) {
+                        var severity = text(cols.severity, i);
+                        var icon = icons[severity] || (icons[severity] = L.AwesomeMarkers.icon({
+                            icon: 'exclamation-triangle',
+                            prefix: 'fa',
+                            markerColor: colors[severity] || 'blue'
+                        }));
+                        var marker = L.marker([cols.lat[i], cols.lng[i]], {icon: icon});
+                        marker.incidentIndex = i;
+                        marker.bindPopup(popup, {maxWidth: 300});
+                        marker.bindTooltip(tooltip);
+                        markers[i] = marker;
+                    }
+                    return markers;
+                };
+
+                var cluster = L.markerClusterGroup({{ this.options|tojson }});
+                cluster.addLayers(buildMarkers({{ this.columns_json }}));
+                cluster.addTo(map);
+
+                // Lets the page replace the incidents shown without re-rendering the map
+                window.setIncidentData = function(cols, fitBounds) {
+                    cluster.clearLayers();
+                    cluster.addLayers(buildMarkers(cols));
+                    // A heat layer fed by the server grid is refreshed through setHeatFilters instead
+                    if (window.incidentHeatLayer && !window.setHeatFilters) {
+                        window.incidentHeatLayer.setLatLngs(cols.lat.map(function(lat, i) {
+                            return [lat, cols.lng[i]];
+                        }));
+                    }
+                    if (fitBounds && cols.lat.length) {
+                        map.fitBounds(cluster.getBounds(), {maxZoom: 12});
+                    }
+                };
+                return cluster;
+            })();
+        {% endmacro %}
+        """)
+
+    def __init__(self, columns, name=None, details_url=None, **kwargs):
+        super(IncidentMarkerCluster, self).__init__(name=name, **kwargs)
+        self._name = 'IncidentMarkerCluster'
+        self.options = _leaflet_options(self.options)
+        self.columns_json = _compact_json(columns)
+        self.details_url = details_url
+
+
+class IncidentHeatMap(plugins.HeatMap):
+    """Heat map layer fed directly from an (n, 2) or (n, 3) NumPy array of points.
+
+    With ``url`` (the ``/api/heat`` endpoint), the layer fetches the weighted
+    density cells for the visible bounding box and zoom whenever the map
+    moves, adding ``query`` (the active filters) to the request. The page
+    can change the filters through ``window.setHeatFilters(query)``.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.heatLayer(
+                {{ this.points_json }},
+                {{ this.options|tojson }}
+            ).addTo({{ this._parent.get_name() }});
+            window.incidentHeatLayer = {{ this.get_name() }};
+            {% if this.url %}
+            (function() {
+                var map = {{ this._parent.get_name() }};
+                var layer = {{ this.get_name() }};
+                var query = {{ this.query|tojson }};
+                var latest = 0;
+                var refresh = function() {
+                    var bounds = map.getBounds();
+                    var bbox = [bounds.getWest(), bounds.getSouth(), bounds.getEast(), bounds.getNorth()]
+                        .map(function(value) { return value.toFixed(5); }).join(',');
+                    var request = ++latest;
+                    fetch({{ this.url|tojson }} + '?bbox=' + bbox + '&zoom=' + map.getZoom() + (query ? '&' + query : ''))
+                        .then(function(response) { return response.json(); })
+                        .then(function(data) {
+                            // Ignore responses overtaken by a later move
+                            if (request === latest && data.points) {
+                                layer.setLatLngs(data.points);
+                            }
+                        })
+                        .catch(function() {});
+                };
+                map.on('moveend', refresh);
+                window.setHeatFilters = function(filters) {
+                    query = filters;
+                    refresh();
+                };
+            })();
+            {% endif %}
+        {% endmacro %}
+        """)
+
+    def __init__(self, points, name=None, url=None, query='', **kwargs):
+        # Server-side cells are already normalised per zoom; a max_zoom of 0
+        # stops Leaflet.heat from scaling intensities down at low zoom levels
+        kwargs.setdefault('max_zoom', 0 if url else 18)
+        super(IncidentHeatMap, self).__init__([], name=name, **kwargs)
+        self._name = 'IncidentHeatMap'
+        self.options = _leaflet_options(self.options)
+        self.points_json = _compact_json(points.round(5).tolist())
+        self.url = url
+        self.query = query
@@ -0,0 +1,185 @@
+"""In-process metrics exposed in the Prometheus text format, and a sampling profiler.
+
+Metrics are plain counters, gauges and histograms keyed by label values,
+kept per process. With several server workers, every worker reports its
+own values; Prometheus sums them when scraped per worker or via a proxy.
+
+The profiler is off unless ``CRIME_MAP_PROFILING`` is set. Then a request
+with ``?profile=1`` is sampled while it runs, and the stacks are written in
+the folded format read by flamegraph.pl and speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+PROFILING = os.environ.get('CRIME_MAP_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('CRIME_MAP_PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL = float(os.environ.get('CRIME_MAP_PROFILE_INTERVAL', 0.001))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+    def _samples(self, items):
+        return [f'{self.name}{_labels(self.label_names, key)} {_number(value)}' for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self, items):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, key)} {cumulative}')
+        return lines
+
+
+REGISTRY = []
+
+REQUEST_SECONDS = Histogram('crime_map_http_request_duration_seconds', 'Time spent handling requests',
+                            ['method', 'route', 'status'])
+RESPONSE_BYTES = Histogram('crime_map_http_response_bytes', 'Size of response bodies',
+                           ['method', 'route'], buckets=BYTES_BUCKETS)
+STAGE_SECONDS = Histogram('crime_map_stage_duration_seconds', 'Time spent in each stage of map and data generation',
+                          ['function', 'stage'])
+DATASET_LOAD_SECONDS = Histogram('crime_map_dataset_load_seconds',
+                                 'Time spent loading the dataset (full load or parsing appended rows)', ['kind'])
+DATASET_ROWS = Gauge('crime_map_dataset_rows', 'Rows in the current dataset snapshot', ['path'])
+RENDER_CACHE = Gauge('crime_map_render_cache', 'Rendered map cache entries, bytes and hit/miss counters', ['stat'])
+
+
+def stage(function, name):
+    """Time a stage of ``function``, e.g. ``with stage('generate_map', 'serialize'):``"""
+    return STAGE_SECONDS.time(function=function, stage=name)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval and counts identical stacks"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = StackCounter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+    def folded(self):
+        """The samples as 'frame;frame;frame count' lines"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def dump(self, label):
+        """Write the folded stacks to PROFILE_DIR and return the file path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+        path = os.path.join(PROFILE_DIR, f"{safe}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.filter_index import Postings, EMPTY_ROWS
+from utils.clustering import severity_codes, SEVERITY_LEVELS
+
+NEIGHBORHOODS_FILE = 'geojson/neighborhoods.geojson'
+NAME_PROPERTIES = ('name', 'neighborhood', 'NAME', 'Name')
+# Cells per axis of the grid bucketing incidents for the polygon bounding-box lookup
+GRID_CELLS = 256
+
+
+def _polygons(geometry):
+    """Return the polygons of a Polygon or MultiPolygon geometry as lists of (n, 2) lng/lat rings"""
+    if not geometry:
+        return []
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        return []
+    return [[np.asarray(ring, dtype='float64')[:, :2] for ring in polygon if len(ring) >= 3] for polygon in polygons]
+
+
+def points_in_rings(x, y, rings):
+    """Even-odd ray casting of points against the rings of one polygon (holes included)"""
+    inside = np.zeros(len(x), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for ring in rings:
+            xi, yi = ring[:, 0], ring[:, 1]
+            xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+            for x1, y1, x2, y2 in zip(xi, yi, xj, yj):
+                crosses = (y1 > y) != (y2 > y)
+                inside ^= crosses & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+    return inside
+
+
+class NeighborhoodIndex:
+    """Neighborhood polygons from a GeoJSON file with their bounding boxes.
+
+    Incidents are bucketed into a coarse grid over the polygons' extent;
+    each polygon only tests the incidents in the cells its bounding box
+    covers.
+    """
+
+    def __init__(self, geojson, version=None):
+        self.version = version
+        self.names = []
+        self.features = []
+        self.parts = []
+        boxes = []
+        for feature in geojson.get('features', []):
+            polygons = _polygons(feature.get('geometry'))
+            if not polygons:
+                continue
+            properties = feature.get('properties') or {}
+            neighborhood = len(self.names)
+            name = next((properties[key] for key in NAME_PROPERTIES if properties.get(key)), None)
+            self.names.append(str(name or f'Neighborhood {neighborhood + 1}'))
+            self.features.append(feature)
+            for rings in polygons:
+                outer = rings[0]
+                self.parts.append((neighborhood, rings))
+                boxes.append([outer[:, 0].min(), outer[:, 1].min(), outer[:, 0].max(), outer[:, 1].max()])
+        self.boxes = np.array(boxes, dtype='float64').reshape(-1, 4)
+        if len(self.boxes):
+            self.origin = self.boxes[:, :2].min(axis=0)
+            extent = self.boxes[:, 2:].max(axis=0) - self.origin
+            self.cell = np.maximum(extent / GRID_CELLS, 1e-9)
+
+    def __len__(self):
+        return len(self.names)
+
+    def assign(self, lat, lng):
+        """Return the neighborhood id of every point, -1 outside all neighborhoods"""
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        ids = np.full(len(lat), -1, dtype='int32')
+        if not len(self.parts) or not len(lat):
+            return ids
+
+        cx = np.floor((lng - self.origin[0]) / self.cell[0])
+        cy = np.floor((lat - self.origin[1]) / self.cell[1])
+        inside = (cx >= 0) & (cx < GRID_CELLS) & (cy >= 0) & (cy < GRID_CELLS)
+        cells = np.where(inside, cy * GRID_CELLS + cx, GRID_CELLS * GRID_CELLS).astype('int64')
+        order = np.argsort(cells, kind='stable')
+        starts = np.searchsorted(cells[order], np.arange(GRID_CELLS * GRID_CELLS + 1))
+
+        for (neighborhood, rings), box in zip(self.parts, self.boxes):
+            x0, y0 = ((box[:2] - self.origin) / self.cell).astype('int64')
+            x1, y1 = np.minimum(((box[2:] - self.origin) / self.cell).astype('int64'), GRID_CELLS - 1)
+            # Cells of one grid row are contiguous in ``order``
+            candidates = np.concatenate([order[starts[row * GRID_CELLS + x0]:starts[row * GRID_CELLS + x1 + 1]]
+                                         for row in range(y0, y1 + 1)])
+            candidates = candidates[ids[candidates] < 0]
+            x, y = lng[candidates], lat[candidates]
+            in_box = (x >= box[0]) & (x <= box[2]) & (y >= box[1]) & (y <= box[3])
+            candidates, x, y = candidates[in_box], x[in_box], y[in_box]
+            ids[candidates[points_in_rings(x, y, rings)]] = neighborhood
+        return ids
+
+    def geojson(self, counts=None):
+        """The neighborhood features with ``neighborhood_id``, ``name`` and ``incidents`` properties added"""
+        features = []
+        for neighborhood, feature in enumerate(self.features):
+            properties = dict(feature.get('properties') or {})
+            properties.update(neighborhood_id=neighborhood, name=self.names[neighborhood])
+            if counts is not None:
+                properties['incidents'] = int(counts[neighborhood])
+            features.append({'type': 'Feature', 'geometry': feature['geometry'], 'properties': properties})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def load_neighborhoods(path=NEIGHBORHOODS_FILE):
+    """Return the ``NeighborhoodIndex`` for a GeoJSON file, re-read when the file changes"""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return NeighborhoodIndex({}, version='missing')
+    version = '%x-%x' % (stat.st_mtime_ns, stat.st_size)
+    index = _indexes.get(path)
+    if index is None or index.version != version:
+        with _indexes_lock:
+            index = _indexes.get(path)
+            if index is None or index.version != version:
+                with open(path) as f:
+                    index = _indexes[path] = NeighborhoodIndex(json.load(f), version=version)
+    return index
+
+
+def _coordinates(df):
+    if 'latitude' not in df.columns or 'longitude' not in df.columns:
+        return np.empty(0), np.empty(0)
+    return df['latitude'].to_numpy(dtype='float64'), df['longitude'].to_numpy(dtype='float64')
+
+
+class NeighborhoodAssignment:
+    """The neighborhood id of every incident, computed once per load and extended on ingest"""
+
+    def __init__(self, df, index):
+        self.index = index
+        lat, lng = _coordinates(df)
+        self.ids = index.assign(lat, lng) if len(lat) else np.full(len(df), -1, dtype='int32')
+        self.postings = Postings(self.ids, len(index))
+        self._stats = None
+
+    def extend(self, dataset, start):
+        """Return an assignment that also covers the rows of ``dataset`` from position ``start`` on"""
+        new_rows = dataset.df.iloc[start:]
+        lat, lng = _coordinates(new_rows)
+        new_ids = self.index.assign(lat, lng) if len(lat) else np.full(len(new_rows), -1, dtype='int32')
+        assignment = NeighborhoodAssignment.__new__(NeighborhoodAssignment)
+        assignment.index = self.index
+        assignment.ids = np.concatenate([self.ids, new_ids])
+        assignment.postings = self.postings.extend(new_ids, start, len(self.index))
+        assignment._stats = None
+        return assignment
+
+    def counts(self):
+        return np.bincount(self.ids + 1, minlength=len(self.index) + 1)[1:]
+
+    def rows_for(self, name):
+        """Return the sorted row ids of incidents in the neighborhood called ``name`` (case-insensitive)"""
+        wanted = str(name).strip().lower()
+        codes = [code for code, value in enumerate(self.index.names) if value.lower() == wanted]
+        return self.postings.rows_for(codes) if codes else EMPTY_ROWS
+
+    def stats(self, df, rows=None):
+        """Incident counts per neighborhood, in total, by severity level and by crime type.
+
+        With ``rows`` (sorted row ids, e.g. a date filter), only those incidents are counted.
+        """
+        if rows is not None:
+            return self._count_stats(self.ids[rows], df.iloc[rows])
+        if self._stats is None:
+            self._stats = self._count_stats(self.ids, df)
+        return self._stats
+
+    def _count_stats(self, ids, df):
+        n = len(self.index)
+        assigned = ids >= 0
+        # Severity code len(SEVERITY_LEVELS) collects unknown levels
+        width = len(SEVERITY_LEVELS) + 1
+        severity = np.bincount(ids[assigned].astype('int64') * width + severity_codes(df)[assigned],
+                               minlength=n * width).reshape(n, width)
+        by_type = [{} for _ in range(n)]
+        if 'crime_type' in df.columns:
+            categories = df['crime_type'].cat.categories.astype(str).tolist()
+            codes = df['crime_type'].cat.codes.to_numpy()
+            keep = assigned & (codes >= 0)
+            table = np.bincount(ids[keep].astype('int64') * len(categories) + codes[keep],
+                                minlength=n * len(categories)).reshape(n, len(categories))
+            by_type = [{categories[code]: int(row[code]) for code in np.argsort(-row, kind='stable') if row[code]}
+                       for row in table]
+
+        counts = np.bincount(ids + 1, minlength=n + 1)[1:]
+        return {
+            'total': int(len(ids)),
+            'unassigned': int(len(ids) - assigned.sum()),
+            'neighborhoods': [
+                {
+                    'id': neighborhood,
+                    'name': self.index.names[neighborhood],
+                    'count': int(counts[neighborhood]),
+                    'severity': {level: int(severity[neighborhood, code])
+                                 for code, level in enumerate(SEVERITY_LEVELS)},
+                    'crime_types': by_type[neighborhood]
+                }
+                for neighborhood in range(n)
+            ]
+        }
+
+
+def neighborhood_assignment(dataset, path=NEIGHBORHOODS_FILE):
+    """Return the neighborhood assignment for a ``CrimeDataset`` snapshot and the current polygons"""
+    index = load_neighborhoods(path)
+    return dataset.derived(('neighborhoods', index.version), lambda data: NeighborhoodAssignment(data.df, index))
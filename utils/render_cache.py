@@ -0,0 +1,109 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Rendered output starting with this is an error message and is never cached
+ERROR_PREFIX = "<div class='alert alert-danger'>"
+
+
+def normalize_filters(location_filter='', crime_type_filter='', severity_filter='', neighborhood_filter='',
+                      date_from=None, date_to=None, days=None):
+    """Reduce filter values to a canonical tuple so equivalent requests share a cache entry"""
+    location = (location_filter or '').lower()
+    if location == 'all':
+        location = ''
+    crime_type = '' if crime_type_filter in (None, '', 'All') else crime_type_filter
+    severity = '' if severity_filter in (None, '', 'All') else severity_filter.lower()
+    neighborhood = (neighborhood_filter or '').strip().lower()
+    if neighborhood == 'all':
+        neighborhood = ''
+    # A "last N days" preset overrides the explicit range
+    date_range = ('', '', int(days)) if days else ((date_from or '').strip(), (date_to or '').strip(), 0)
+    return (location, crime_type, severity, neighborhood) + date_range
+
+
+class RenderCache:
+    """LRU cache of rendered map HTML (or other output), bounded by total size in bytes.
+
+    Entries belong to a single dataset version; the first lookup made with
+    a different version drops everything cached for the previous one.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _reset(self, version):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        self._version = version
+
+    def get(self, version, key):
+        """Return the cached value for ``key``, or None on a miss"""
+        with self._lock:
+            if version != self._version:
+                self._reset(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version, key, value, size=None):
+        """Cache ``value`` (text, or bytes) unless it is larger than the whole cache"""
+        if size is None:
+            size = len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if version != self._version or key in self._entries:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_render(self, version, key, render):
+        """Return the cached output for ``key``, calling ``render()`` on a miss"""
+        value = self.get(version, key)
+        if value is not None:
+            return value
+
+        value = render()
+        if not value.startswith(ERROR_PREFIX):
+            self.put(version, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'dataset_version': self._version
+            }
+
+
+map_cache = RenderCache(int(os.environ.get('CRIME_MAP_CACHE_BYTES', 64 * 1024 * 1024)))
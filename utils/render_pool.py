@@ -0,0 +1,73 @@
+"""Process pool for CPU-heavy map rendering.
+
+Folium rendering holds the GIL for the whole render, so inline renders stall
+every other request handled by the same process. With
+``CRIME_MAP_RENDER_WORKERS`` set to a positive number, renders run in that
+many separate processes instead, and request threads only wait on the
+result. ``gunicorn.conf.py`` defaults it to 1 and sizes the server workers
+so both together fit the CPUs; the development server renders inline. Each
+render process loads the dataset through its own store (from the binary
+snapshot when there is one) and keeps it between renders, so every render
+process costs about one more copy of the dataset in memory.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.render_cache import ERROR_PREFIX
+
+RENDER_WORKERS = int(os.environ.get('CRIME_MAP_RENDER_WORKERS', 0))
+RENDER_TIMEOUT = float(os.environ.get('CRIME_MAP_RENDER_TIMEOUT', 120))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork belongs to the parent; every server worker starts its own
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(RENDER_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def render(func, *args):
+    """Return ``func(*args)``, computed in the render pool when one is configured.
+
+    ``func`` must be a module-level function (e.g. ``generate_map``) so it
+    can be sent to the render processes.
+    """
+    if RENDER_WORKERS <= 0:
+        return func(*args)
+
+    pool = _get_pool()
+    try:
+        return pool.submit(func, *args).result(timeout=RENDER_TIMEOUT)
+    except TimeoutError:
+        print(f"Error rendering map: {func.__name__} took longer than {RENDER_TIMEOUT}s")
+        return f"{ERROR_PREFIX}Rendering the map took too long, please try again.</div>"
+    except BrokenProcessPool as e:
+        # A render process died; start a fresh pool next time and render this one inline
+        print(f"Error in render pool: {e}")
+        _discard_pool(pool)
+        return func(*args)
+
+
+def pool_stats():
+    return {
+        'workers': max(RENDER_WORKERS, 0),
+        'running': _pool is not None and _pool_pid == os.getpid()
+    }
@@ -0,0 +1,226 @@
+import heapq
+import math
+import os
+
+import numpy as np
+
+from utils.geo import KM_PER_DEGREE_LAT, haversine_km
+from utils.clustering import severity_codes
+from utils.heat_grid import SEVERITY_WEIGHTS, gaussian_blur
+
+# Finest raster cell; doubled until the raster over the data extent fits MAX_RASTER_CELLS
+ROUTE_CELL_KM = 1.0
+MAX_RASTER_CELLS = int(os.environ.get('CRIME_MAP_ROUTE_MAX_CELLS', 2_000_000))
+# A route is searched on the finest level whose search window has at most this many cells
+MAX_SEARCH_CELLS = int(os.environ.get('CRIME_MAP_ROUTE_SEARCH_CELLS', 40_000))
+# Incident density is spread over this distance before it becomes risk
+RISK_SIGMA_KM = 1.5
+# A step through the riskiest cells costs (1 + RISK_WEIGHT) times its length
+RISK_WEIGHT = 4.0
+# Density at this percentile of the occupied cells (and above) counts as risk 1
+RISK_PERCENTILE = 99
+# Cells of slack around the start/end box that a route may detour through, at least
+MIN_MARGIN_CELLS = 3
+
+SQRT2 = math.sqrt(2.0)
+STEPS = [(dy, dx, math.hypot(dy, dx)) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx]
+
+
+def _risk(weights, cell_km):
+    """Blur severity-weighted counts into a 0..1 risk surface"""
+    blurred = gaussian_blur(weights, max(RISK_SIGMA_KM / cell_km, 0.5))
+    occupied = blurred[blurred > 1e-9]
+    scale = np.percentile(occupied, RISK_PERCENTILE) if len(occupied) else 1.0
+    return np.minimum(blurred / scale, 1.0).astype('float32')
+
+
+def _octile(dy, dx):
+    dy, dx = abs(dy), abs(dx)
+    return max(dy, dx) + (SQRT2 - 1) * min(dy, dx)
+
+
+def _astar(risk, start, goal, weight):
+    """Least-cost 8-connected path between two cells of ``risk``, as a list of (row, col) cells.
+
+    A step costs its length in cells times ``1 + weight * risk`` averaged
+    over the two cells, so the octile distance is an admissible heuristic.
+    """
+    rows, cols = risk.shape
+    values = risk.ravel().tolist()
+    goal_y, goal_x = goal
+    target = goal_y * cols + goal_x
+    source = start[0] * cols + start[1]
+    costs = {source: 0.0}
+    parents = {source: -1}
+    closed = bytearray(rows * cols)
+    heap = [(_octile(start[0] - goal_y, start[1] - goal_x), 0.0, source)]
+    while heap:
+        _, cost, i = heapq.heappop(heap)
+        if closed[i]:
+            continue
+        if i == target:
+            break
+        closed[i] = 1
+        y, x = divmod(i, cols)
+        risk_i = values[i]
+        for dy, dx, length in STEPS:
+            ny, nx = y + dy, x + dx
+            if 0 <= ny < rows and 0 <= nx < cols:
+                j = ny * cols + nx
+                if closed[j]:
+                    continue
+                step = cost + length * (1.0 + weight * 0.5 * (risk_i + values[j]))
+                if step < costs.get(j, math.inf):
+                    costs[j] = step
+                    parents[j] = i
+                    heapq.heappush(heap, (step + _octile(ny - goal_y, nx - goal_x), step, j))
+
+    path = []
+    i = target
+    while i != -1:
+        path.append(divmod(i, cols))
+        i = parents[i]
+    return path[::-1]
+
+
+def _turns(path):
+    """Drop the cells in the middle of straight runs"""
+    if len(path) < 3:
+        return path
+    kept = [path[0]]
+    for previous, cell, following in zip(path, path[1:], path[2:]):
+        if (cell[0] - previous[0], cell[1] - previous[1]) != (following[0] - cell[0], following[1] - cell[1]):
+            kept.append(cell)
+    kept.append(path[-1])
+    return kept
+
+
+class RiskLevel:
+    """Risk raster at one cell size, on an equirectangular projection scaled at the data's mean latitude"""
+
+    def __init__(self, weights, cell_km, lat0, lng0, km_per_degree_lng):
+        self.weights = weights
+        self.cell_km = cell_km
+        self.lat0 = lat0
+        self.lng0 = lng0
+        self.km_per_degree_lng = km_per_degree_lng
+        self.risk = _risk(weights, cell_km)
+
+    def coarser(self):
+        rows, cols = self.weights.shape
+        padded = np.zeros((rows + rows % 2, cols + cols % 2))
+        padded[:rows, :cols] = self.weights
+        weights = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).sum(axis=(1, 3))
+        return RiskLevel(weights, self.cell_km * 2, self.lat0, self.lng0, self.km_per_degree_lng)
+
+    def cell(self, lat, lng):
+        """(row, col) of the cell holding a point, clamped to the raster"""
+        rows, cols = self.risk.shape
+        row = int((lat - self.lat0) * KM_PER_DEGREE_LAT // self.cell_km)
+        col = int((lng - self.lng0) * self.km_per_degree_lng // self.cell_km)
+        return min(max(row, 0), rows - 1), min(max(col, 0), cols - 1)
+
+    def center(self, row, col):
+        """(lat, lng) of a cell's center"""
+        return (self.lat0 + (row + 0.5) * self.cell_km / KM_PER_DEGREE_LAT,
+                self.lng0 + (col + 0.5) * self.cell_km / self.km_per_degree_lng)
+
+    def line_risk(self, start, end):
+        """Length-weighted mean risk along the straight line between two (lat, lng) points"""
+        start_cell, end_cell = self.cell(*start), self.cell(*end)
+        samples = max(2, int(2 * _octile(end_cell[0] - start_cell[0], end_cell[1] - start_cell[1])) + 2)
+        fractions = np.linspace(0.0, 1.0, samples)
+        cells = [self.cell(start[0] + f * (end[0] - start[0]), start[1] + f * (end[1] - start[1])) for f in fractions]
+        return float(np.mean([self.risk[cell] for cell in cells]))
+
+
+class RiskRaster:
+    """Incident risk rasters at doubling cell sizes, built once per dataset load.
+
+    Each level holds severity-weighted incident counts per cell, blurred
+    and scaled to 0..1. Routes are searched with A* on the finest level
+    where the box around their endpoints stays within MAX_SEARCH_CELLS.
+    """
+
+    def __init__(self, lat, lng, severity):
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        lat, lng, severity = lat[valid], lng[valid], severity[valid]
+        if not len(lat):
+            lat, lng, severity = np.zeros(1), np.zeros(1), np.zeros(1, dtype='int64')
+
+        km_per_degree_lng = KM_PER_DEGREE_LAT * math.cos(math.radians(float(lat.mean())))
+        height_km = (lat.max() - lat.min()) * KM_PER_DEGREE_LAT
+        width_km = (lng.max() - lng.min()) * km_per_degree_lng
+        cell_km = ROUTE_CELL_KM
+        while (height_km / cell_km + 2 * MIN_MARGIN_CELLS + 1) * (width_km / cell_km + 2 * MIN_MARGIN_CELLS + 1) > MAX_RASTER_CELLS:
+            cell_km *= 2
+
+        # Pad the extent so routes can pass around incidents at its edge
+        lat0 = lat.min() - MIN_MARGIN_CELLS * cell_km / KM_PER_DEGREE_LAT
+        lng0 = lng.min() - MIN_MARGIN_CELLS * cell_km / km_per_degree_lng
+        rows = int(height_km / cell_km) + 2 * MIN_MARGIN_CELLS + 1
+        cols = int(width_km / cell_km) + 2 * MIN_MARGIN_CELLS + 1
+        row = np.clip(((lat - lat0) * KM_PER_DEGREE_LAT // cell_km).astype('int64'), 0, rows - 1)
+        col = np.clip(((lng - lng0) * km_per_degree_lng // cell_km).astype('int64'), 0, cols - 1)
+        weights = np.bincount(row * cols + col, weights=SEVERITY_WEIGHTS[severity],
+                              minlength=rows * cols).reshape(rows, cols)
+
+        level = RiskLevel(weights, cell_km, lat0, lng0, km_per_degree_lng)
+        self.levels = [level]
+        while level.risk.size > 4 * 64 * 64:
+            level = level.coarser()
+            self.levels.append(level)
+
+    @classmethod
+    def from_frame(cls, df):
+        if 'latitude' not in df.columns or 'longitude' not in df.columns:
+            return cls([], [], np.empty(0, dtype='int64'))
+        return cls(df['latitude'].to_numpy(dtype='float64', na_value=np.nan),
+                   df['longitude'].to_numpy(dtype='float64', na_value=np.nan), severity_codes(df))
+
+    def _window(self, level, start_cell, end_cell):
+        """Row and column ranges of the search box around two cells on ``level``"""
+        rows, cols = level.risk.shape
+        margin = max(MIN_MARGIN_CELLS, int(0.25 * max(abs(end_cell[0] - start_cell[0]), abs(end_cell[1] - start_cell[1]))))
+        row0 = max(min(start_cell[0], end_cell[0]) - margin, 0)
+        row1 = min(max(start_cell[0], end_cell[0]) + margin, rows - 1)
+        col0 = max(min(start_cell[1], end_cell[1]) - margin, 0)
+        col1 = min(max(start_cell[1], end_cell[1]) + margin, cols - 1)
+        return row0, row1, col0, col1
+
+    def route(self, start, end, weight=RISK_WEIGHT):
+        """Lowest-risk path between two (lat, lng) points, with its length and risk next to the direct line's"""
+        for level in self.levels:
+            start_cell, end_cell = level.cell(*start), level.cell(*end)
+            row0, row1, col0, col1 = self._window(level, start_cell, end_cell)
+            if (row1 - row0 + 1) * (col1 - col0 + 1) <= MAX_SEARCH_CELLS:
+                break
+
+        window = level.risk[row0:row1 + 1, col0:col1 + 1]
+        cells = _astar(window, (start_cell[0] - row0, start_cell[1] - col0),
+                       (end_cell[0] - row0, end_cell[1] - col0), weight)
+        cells = [(row + row0, col + col0) for row, col in cells]
+
+        risks = np.array([level.risk[cell] for cell in cells], dtype='float64')
+        lengths = np.array([math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(cells, cells[1:])]) * level.cell_km
+        path = [tuple(start)] + [level.center(*cell) for cell in _turns(cells)[1:-1]] + [tuple(end)]
+        path_lat, path_lng = np.array(path).T
+        distance = float(haversine_km(path_lat[:-1], path_lng[:-1], path_lat[1:], path_lng[1:]).sum())
+        risk = float(((risks[:-1] + risks[1:]) / 2 * lengths).sum() / lengths.sum()) if lengths.sum() else float(risks[0])
+
+        return {
+            'path': [[round(float(lat), 5), round(float(lng), 5)] for lat, lng in path],
+            'distance_km': round(distance, 3),
+            'risk_score': round(risk, 4),
+            'direct_distance_km': round(float(haversine_km(start[0], start[1], end[0], end[1])), 3),
+            'direct_risk_score': round(level.line_risk(start, end), 4),
+            'cell_km': level.cell_km,
+            'risk_weight': weight
+        }
+
+
+def risk_raster(dataset):
+    """Return the route risk raster for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('risk_raster', lambda data: RiskRaster.from_frame(data.df))
@@ -0,0 +1,120 @@
+"""Binary columnar snapshots of the crime CSV.
+
+A snapshot is a directory next to the CSV holding one ``.npy`` file per
+column. Text columns are dictionary-encoded as integer codes plus a list of
+categories. The dataset store memory-maps the arrays instead of parsing
+text, so startup cost no longer grows with the size of the CSV. Rows
+appended to the CSV after the snapshot was built are parsed from the CSV
+and added on top; a CSV that was rewritten makes the snapshot stale and the
+store falls back to parsing the CSV.
+
+Build or refresh the snapshot after replacing the data file:
+
+    python -m utils.snapshot build data/crime_data.csv
+"""
+import argparse
+import base64
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT = 1
+META_FILE = 'meta.json'
+
+
+def snapshot_dir(csv_file):
+    """Return the snapshot directory used for ``csv_file``"""
+    return os.path.splitext(csv_file)[0] + '.snapshot'
+
+
+def write_snapshot(dataset, directory):
+    """Write the columns of a ``CrimeDataset`` to ``directory``, replacing any previous snapshot"""
+    df = dataset.df
+    tmp = f'{directory}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        if series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+            np.save(os.path.join(tmp, f'{i}.codes.npy'), series.cat.codes.to_numpy())
+            columns.append({'name': name, 'kind': 'category',
+                            'categories': series.cat.categories.astype(str).tolist()})
+        else:
+            np.save(os.path.join(tmp, f'{i}.npy'), series.to_numpy())
+            columns.append({'name': name, 'kind': 'array'})
+
+    meta = {
+        'format': SNAPSHOT_FORMAT,
+        'rows': len(df),
+        'columns': columns,
+        'source': {
+            'signature': list(dataset.signature),
+            'offset': dataset.offset,
+            'tail': base64.b64encode(dataset.tail).decode('ascii'),
+            'digest': dataset.digest
+        }
+    }
+    with open(os.path.join(tmp, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+    # Swap directories so readers never see a half-written snapshot
+    old = f'{directory}.old-{os.getpid()}'
+    if os.path.exists(directory):
+        os.rename(directory, old)
+    os.rename(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def read_snapshot(directory):
+    """Memory-map a snapshot; returns (df, source) where source describes the CSV bytes it covers"""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    if meta.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"unsupported snapshot format {meta.get('format')}")
+
+    data = {}
+    for i, column in enumerate(meta['columns']):
+        if column['kind'] == 'category':
+            codes = np.load(os.path.join(directory, f'{i}.codes.npy'), mmap_mode='r')
+            data[column['name']] = pd.Categorical.from_codes(codes, categories=column['categories'])
+        else:
+            # A plain ndarray view of the mapping, so pandas never sees the memmap subclass
+            data[column['name']] = np.asarray(np.load(os.path.join(directory, f'{i}.npy'), mmap_mode='r'))
+    df = pd.DataFrame(data, columns=[column['name'] for column in meta['columns']], copy=False)
+    if len(df) != meta['rows']:
+        raise ValueError('snapshot columns have inconsistent lengths')
+
+    source = meta['source']
+    return df, (tuple(source['signature']), source['offset'], base64.b64decode(source['tail']), source.get('digest'))
+
+
+def build_snapshot(csv_file, directory=None):
+    """Parse ``csv_file`` and write its snapshot"""
+    from utils.data_store import load_dataset
+    return write_snapshot(load_dataset(csv_file), directory or snapshot_dir(csv_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage binary snapshots of the crime dataset')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='write a memory-mappable snapshot of a CSV file')
+    build.add_argument('csv_file', nargs='?', default='data/crime_data.csv')
+    build.add_argument('--output', help='snapshot directory (default: next to the CSV)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    meta = build_snapshot(args.csv_file, args.output)
+    print(f"Wrote {meta['rows']} rows to {args.output or snapshot_dir(args.csv_file)} "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
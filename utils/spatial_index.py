@@ -0,0 +1,144 @@
+import copy
+
+import numpy as np
+
+from utils.geo import KM_PER_DEGREE_LAT, degree_span, haversine_km
+
+# Average number of incidents per occupied-area cell the grid aims for
+TARGET_PER_CELL = 16
+MIN_CELL_DEG = 0.002
+
+
+class GridIndex:
+    """Uniform latitude/longitude grid over incident coordinates.
+
+    Points are sorted by cell key (``cell_row * n_cols + cell_col``) so each
+    grid row's span of cells is one contiguous slice, found with two binary
+    searches. A radius query therefore only computes haversine distances for
+    points in the cells overlapping the circle's bounding box. Longitudes are
+    not wrapped at the antimeridian.
+    """
+
+    def __init__(self, lat, lng, cell_deg=None):
+        lat = np.asarray(lat, dtype='float64')
+        lng = np.asarray(lng, dtype='float64')
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        rows = np.flatnonzero(valid)
+        lat, lng = lat[valid], lng[valid]
+
+        if len(rows):
+            self.lat0, self.lng0 = lat.min(), lng.min()
+            lat_extent, lng_extent = lat.max() - self.lat0, lng.max() - self.lng0
+        else:
+            self.lat0 = self.lng0 = 0.0
+            lat_extent = lng_extent = 0.0
+
+        if cell_deg is None:
+            area = max(lat_extent * lng_extent, MIN_CELL_DEG ** 2)
+            cell_deg = max(np.sqrt(area * TARGET_PER_CELL / max(len(rows), 1)), MIN_CELL_DEG)
+        self.cell_deg = float(cell_deg)
+        self.n_rows = int(lat_extent // self.cell_deg) + 1
+        self.n_cols = int(lng_extent // self.cell_deg) + 1
+
+        keys = self._cell_row(lat) * self.n_cols + self._cell_col(lng)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.rows = rows[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build an index whose row ids are positions in ``df``"""
+        if 'latitude' not in df.columns or 'longitude' not in df.columns:
+            return cls([], [])
+        return cls(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+
+    def extend(self, dataset, start):
+        """Return an index that also holds the rows of ``dataset`` from position ``start`` on"""
+        df = dataset.df
+        if 'latitude' not in df.columns or 'longitude' not in df.columns:
+            return self
+        lat = df['latitude'].to_numpy()[start:].astype('float64')
+        lng = df['longitude'].to_numpy()[start:].astype('float64')
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        rows = np.flatnonzero(valid) + start
+        lat, lng = lat[valid], lng[valid]
+
+        cell_rows, cell_cols = self._cell_row(lat), self._cell_col(lng)
+        outside = ((cell_rows < 0) | (cell_rows >= self.n_rows) | (cell_cols < 0) | (cell_cols >= self.n_cols))
+        if not len(self) or outside.any():
+            # The grid only covers the original extent
+            return GridIndex.from_frame(df)
+
+        keys = cell_rows * self.n_cols + cell_cols
+        order = np.argsort(keys, kind='stable')
+        positions = np.searchsorted(self.keys, keys[order], side='right')
+        index = copy.copy(self)
+        index.keys = np.insert(self.keys, positions, keys[order])
+        index.rows = np.insert(self.rows, positions, rows[order])
+        index.lat = np.insert(self.lat, positions, lat[order])
+        index.lng = np.insert(self.lng, positions, lng[order])
+        return index
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _cell_row(self, lat):
+        return np.floor((np.asarray(lat) - self.lat0) / self.cell_deg).astype('int64')
+
+    def _cell_col(self, lng):
+        return np.floor((np.asarray(lng) - self.lng0) / self.cell_deg).astype('int64')
+
+    def _candidates(self, lat, lng, radius_km):
+        """Return positions (into the sorted arrays) of points in cells overlapping the circle"""
+        lat_span, lng_span = degree_span(lat, radius_km)
+        row0 = max(int(self._cell_row(lat - lat_span)), 0)
+        row1 = min(int(self._cell_row(lat + lat_span)), self.n_rows - 1)
+        col0 = max(int(self._cell_col(lng - lng_span)), 0)
+        col1 = min(int(self._cell_col(lng + lng_span)), self.n_cols - 1)
+        if row0 > row1 or col0 > col1:
+            return np.empty(0, dtype='int64')
+
+        grid_rows = np.arange(row0, row1 + 1, dtype='int64') * self.n_cols
+        starts = np.searchsorted(self.keys, grid_rows + col0, side='left')
+        ends = np.searchsorted(self.keys, grid_rows + col1, side='right')
+        return np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+    def query_radius(self, lat, lng, radius_km, keep=None):
+        """Return (row ids, distances in km) of points within ``radius_km``, nearest first.
+
+        ``keep`` is an optional boolean mask over row ids; other rows are skipped.
+        """
+        positions = self._candidates(lat, lng, radius_km)
+        if keep is not None:
+            positions = positions[keep[self.rows[positions]]]
+        distances = haversine_km(lat, lng, self.lat[positions], self.lng[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return self.rows[positions[order]], distances[order]
+
+    def query_nearest(self, lat, lng, k, max_radius_km=None, keep=None):
+        """Return (row ids, distances in km) of the ``k`` nearest points (among ``keep``), nearest first"""
+        if k <= 0 or not len(self):
+            return np.empty(0, dtype='int64'), np.empty(0)
+
+        # Grow the search circle until it holds k points or covers the whole grid
+        corner_lat = [self.lat0, self.lat0 + self.n_rows * self.cell_deg]
+        corner_lng = [self.lng0, self.lng0 + self.n_cols * self.cell_deg]
+        full_radius = float(haversine_km(lat, lng, np.repeat(corner_lat, 2), np.tile(corner_lng, 2)).max())
+        if max_radius_km is not None:
+            full_radius = min(full_radius, max_radius_km)
+
+        radius = min(self.cell_deg * KM_PER_DEGREE_LAT, full_radius)
+        while True:
+            rows, distances = self.query_radius(lat, lng, radius, keep)
+            if len(rows) >= k or radius >= full_radius:
+                return rows[:k], distances[:k]
+            radius = min(radius * 2.0, full_radius)
+
+
+def spatial_index(dataset):
+    """Return the grid index for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('spatial_index', lambda data: GridIndex.from_frame(data.df))
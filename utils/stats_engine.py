@@ -0,0 +1,100 @@
+import heapq
+from collections import Counter
+
+import numpy as np
+
+RECENT_COUNT = 5
+RECENT_COLUMNS = ['location_description', 'crime_type', 'severity', 'date']
+
+
+def _counts(df, column, lower=False):
+    if column not in df.columns:
+        return Counter()
+    values = df[column].str.lower() if lower else df[column]
+    return Counter({str(key): int(count) for key, count in values.value_counts().items() if count})
+
+
+def _recent_candidates(df, start, n):
+    """Return (date_ns, row, record) for the ``n`` latest-dated rows of ``df``, row ids offset by ``start``"""
+    if 'date' not in df.columns or not len(df):
+        return []
+    dates = df['date'].to_numpy(dtype='datetime64[ns]')
+    valid = np.flatnonzero(~np.isnat(dates))
+    dates = dates.astype('int64')
+    if len(valid) > n:
+        valid = valid[np.argpartition(dates[valid], len(valid) - n)[len(valid) - n:]]
+
+    columns = [column for column in RECENT_COLUMNS if column in df.columns]
+    rows = df.iloc[valid][columns].astype(object)
+    rows['date'] = df['date'].iloc[valid].dt.strftime('%Y-%m-%d')
+    records = rows.where(rows.notna(), None).to_dict('records')
+    return [(int(dates[i]), start + int(i), record) for i, record in zip(valid, records)]
+
+
+class CrimeStatistics:
+    """Running aggregates over the incidents: totals, counts per dimension and the latest incidents.
+
+    Built once per dataset load and extended with appended rows, so the
+    API answers from the precomputed values instead of touching the rows.
+    """
+
+    def __init__(self, df):
+        self.total = len(df)
+        self.by_type = _counts(df, 'crime_type')
+        self.by_severity = _counts(df, 'severity')
+        self.by_severity_level = _counts(df, 'severity', lower=True)
+        self.by_location = _counts(df, 'location_description')
+        self.has_severity = 'severity' in df.columns
+        self.recent = heapq.nlargest(RECENT_COUNT, _recent_candidates(df, 0, RECENT_COUNT), key=lambda item: item[:2])
+        self.top_location = max(self.by_location.items(), key=lambda item: item[1], default=("N/A", 0))
+        self._summary = None
+
+    def extend(self, dataset, start):
+        """Return statistics that also count the rows of ``dataset`` from position ``start`` on"""
+        new_rows = dataset.df.iloc[start:]
+        stats = CrimeStatistics.__new__(CrimeStatistics)
+        stats.total = self.total + len(new_rows)
+        stats.by_type = self.by_type + _counts(new_rows, 'crime_type')
+        stats.by_severity = self.by_severity + _counts(new_rows, 'severity')
+        stats.by_severity_level = self.by_severity_level + _counts(new_rows, 'severity', lower=True)
+        added_locations = _counts(new_rows, 'location_description')
+        stats.by_location = self.by_location + added_locations
+        stats.has_severity = self.has_severity
+        stats.recent = heapq.nlargest(RECENT_COUNT, self.recent + _recent_candidates(new_rows, start, RECENT_COUNT),
+                                      key=lambda item: item[:2])
+
+        # Counts only grow, so the top location is the old one or one of those just updated
+        stats.top_location = self.top_location
+        for location in added_locations:
+            if stats.by_location[location] > stats.top_location[1]:
+                stats.top_location = (location, stats.by_location[location])
+        stats._summary = None
+        return stats
+
+    def severity_summary(self):
+        """Totals by severity level, as served by /api/stats"""
+        return {
+            'total': self.total,
+            'low': self.by_severity_level.get('low', 0),
+            'medium': self.by_severity_level.get('medium', 0),
+            'high': self.by_severity_level.get('high', 0)
+        }
+
+    def summary(self):
+        """The full breakdown returned by generate_statistics and /api/statistics"""
+        if self._summary is None:
+            self._summary = {
+                'total_crimes': self.total,
+                'crime_by_type': dict(self.by_type.most_common()),
+                'severity_counts': dict(self.by_severity.most_common()),
+                'location_counts': dict(self.by_location.most_common()),
+                'top_location': self.top_location[0],
+                'top_location_count': self.top_location[1],
+                'recent_crimes': [record for _, _, record in self.recent]
+            }
+        return self._summary
+
+
+def crime_statistics(dataset):
+    """Return the statistics for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('crime_statistics', lambda data: CrimeStatistics(data.df))
@@ -0,0 +1,160 @@
+import numpy as np
+
+DIMENSIONS = ['crime_type', 'severity', 'location_description']
+GRANULARITIES = ['day', 'week', 'month', 'year']
+# A dimension's daily table is only kept if it has at most this many cells
+MAX_CUBE_CELLS = 20000000
+
+
+def _days(dates):
+    """Convert a datetime Series to integer days since 1970-01-01, -1 for missing dates"""
+    values = dates.to_numpy(dtype='datetime64[ns]')
+    days = values.astype('datetime64[D]').astype('int64')
+    days[np.isnat(values)] = -1
+    return days
+
+
+def _day_label(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def bucket_starts(first_day, last_day, granularity):
+    """Return the first day of every bucket covering [first_day, last_day]"""
+    if granularity == 'day':
+        return np.arange(first_day, last_day + 1)
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        first_monday = first_day - (first_day + 3) % 7
+        starts = np.arange(first_monday, last_day + 1, 7)
+    else:
+        unit = 'M' if granularity == 'month' else 'Y'
+        first = np.datetime64(int(first_day), 'D').astype(f'datetime64[{unit}]')
+        last = np.datetime64(int(last_day), 'D').astype(f'datetime64[{unit}]')
+        starts = np.arange(first, last + 1).astype('datetime64[D]').astype('int64')
+    return np.maximum(starts, first_day)
+
+
+def bucket_label(day, granularity):
+    label = _day_label(day)
+    return {'month': label[:7], 'year': label[:4]}.get(granularity, label)
+
+
+class TimeCube:
+    """Daily incident counts per crime type, severity and location.
+
+    Each dimension is a (days x categories) table stored as cumulative sums
+    over days, so the count for any date range is one subtraction of two
+    rows. Day, week, month and year rollups slice the same table at bucket
+    boundaries instead of regrouping the incidents.
+    """
+
+    def __init__(self, df):
+        self.daily = {}
+        self.categories = {}
+        days = _days(df['date']) if 'date' in df.columns else np.full(len(df), -1, dtype='int64')
+        valid = days >= 0
+        if valid.any():
+            self.first_day, self.last_day = int(days[valid].min()), int(days[valid].max())
+        else:
+            self.first_day, self.last_day = 0, -1
+        self.daily_total = self._count(days[valid], np.zeros(valid.sum(), dtype='int64'), 1)[:, 0]
+
+        for column in DIMENSIONS:
+            if column not in df.columns:
+                continue
+            categories = df[column].cat.categories.astype(str).tolist()
+            if self.n_days * max(len(categories), 1) > MAX_CUBE_CELLS:
+                continue
+            codes = df[column].cat.codes.to_numpy()
+            keep = valid & (codes >= 0)
+            self.categories[column] = categories
+            self.daily[column] = self._count(days[keep], codes[keep], len(categories))
+        self._build_prefix()
+
+    @property
+    def n_days(self):
+        return self.last_day - self.first_day + 1
+
+    def _count(self, days, codes, n_categories):
+        flat = (days - self.first_day) * n_categories + codes
+        return np.bincount(flat, minlength=self.n_days * n_categories).reshape(self.n_days, n_categories).astype('int32')
+
+    def _build_prefix(self):
+        self.prefix_total = np.concatenate([[0], np.cumsum(self.daily_total, dtype='int64')])
+        self.prefix = {
+            column: np.vstack([np.zeros((1, daily.shape[1]), dtype='int64'), np.cumsum(daily, axis=0, dtype='int64')])
+            for column, daily in self.daily.items()
+        }
+
+    def extend(self, dataset, start):
+        """Return a cube that also counts the rows of ``dataset`` from position ``start`` on"""
+        df = dataset.df
+        new_rows = df.iloc[start:]
+        days = _days(new_rows['date']) if 'date' in new_rows.columns else np.full(len(new_rows), -1, dtype='int64')
+        valid = days >= 0
+
+        cube = TimeCube.__new__(TimeCube)
+        cube.first_day, cube.last_day = self.first_day, self.last_day
+        if valid.any():
+            if self.n_days > 0:
+                cube.first_day = min(self.first_day, int(days[valid].min()))
+                cube.last_day = max(self.last_day, int(days[valid].max()))
+            else:
+                cube.first_day, cube.last_day = int(days[valid].min()), int(days[valid].max())
+        before = self.first_day - cube.first_day if self.n_days > 0 else 0
+
+        def grow(daily, n_categories):
+            # Pad the existing table to the new day range and category count
+            grown = np.zeros((cube.n_days, n_categories), dtype='int32')
+            grown[before:before + daily.shape[0], :daily.shape[1]] = daily
+            return grown
+
+        cube.daily_total = grow(self.daily_total[:, None], 1)[:, 0] + cube._count(
+            days[valid], np.zeros(valid.sum(), dtype='int64'), 1)[:, 0]
+        cube.daily, cube.categories = {}, {}
+        for column, daily in self.daily.items():
+            categories = df[column].cat.categories.astype(str).tolist()
+            # Same limit as a fresh build: an outlier date must not blow up every table
+            if cube.n_days * max(len(categories), 1) > MAX_CUBE_CELLS:
+                continue
+            codes = new_rows[column].cat.codes.to_numpy()
+            keep = valid & (codes >= 0)
+            cube.categories[column] = categories
+            cube.daily[column] = grow(daily, len(categories)) + cube._count(days[keep], codes[keep], len(categories))
+        cube._build_prefix()
+        return cube
+
+    def rollup(self, granularity='month', dimension=None, date_from=None, date_to=None, days=None):
+        """Return bucket labels, totals and (optionally) per-category counts for a date range.
+
+        ``days`` selects the last N days up to the latest incident instead of ``date_from``/``date_to``.
+        """
+        first, last = self.first_day, self.last_day
+        if days:
+            first = max(first, last - int(days) + 1)
+            date_from = date_to = None
+        if date_from is not None:
+            first = max(first, int(np.datetime64(date_from, 'D').astype('int64')))
+        if date_to is not None:
+            last = min(last, int(np.datetime64(date_to, 'D').astype('int64')))
+        if first > last:
+            return {'buckets': [], 'total': [], 'series': {}}
+
+        starts = bucket_starts(first, last, granularity)
+        bounds = np.append(starts, last + 1) - self.first_day
+        result = {
+            'buckets': [bucket_label(day, granularity) for day in starts],
+            'total': np.diff(self.prefix_total[bounds]).tolist(),
+            'series': {}
+        }
+        if dimension is not None:
+            counts = np.diff(self.prefix[dimension][bounds], axis=0)
+            present = np.flatnonzero(counts.sum(axis=0))
+            categories = self.categories[dimension]
+            result['series'] = {categories[code]: counts[:, code].tolist() for code in present}
+        return result
+
+
+def time_cube(dataset):
+    """Return the time cube for a ``CrimeDataset`` snapshot, built once per load"""
+    return dataset.derived('time_cube', lambda data: TimeCube(data.df))
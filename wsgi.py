@@ -0,0 +1,18 @@
+"""WSGI entry point for serving the app with several worker processes.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With ``preload_app`` the dataset and its indexes are loaded once in the
+master process, and the forked workers share those read-only pages.
+"""
+from app import app, DATA_FILE
+from utils.data_store import load_dataset
+from utils.filter_index import filter_index
+from utils.gazetteer import gazetteer
+from utils.stats_engine import crime_statistics
+
+# Warm the snapshot and the structures every worker needs before forking
+_dataset = load_dataset(DATA_FILE)
+filter_index(_dataset)
+crime_statistics(_dataset)
+gazetteer(_dataset)